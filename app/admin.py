@@ -1,7 +1,7 @@
 # app/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Invite, Message, MoveInfo, Task
+from .models import CustomUser, Invite, Message, MoveInfo, OutboxEmail, Task
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -45,4 +45,13 @@ admin.site.register(MoveInfo)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('created_by', 'task_name', 'is_completed', 'created_at')  # 表示カラムを指定
     list_filter = ('is_completed',)
-    search_fields = ('task_name', 'created_by__email')
\ No newline at end of file
+    search_fields = ('task_name', 'created_by__email')
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('locked_by', 'last_error')
+    ordering = ('-created_at',)
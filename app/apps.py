@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app'
+
+    def ready(self):
+        # シグナル・システムチェックの登録
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,92 @@
+# app/auth_backends.py
+"""
+ログイン中ユーザーの読み込み（AuthenticationMiddleware がリクエストごとに呼ぶ get_user）
+
+- ユーザーは MoveInfo とそのオーナーまで1回のクエリで読み込み、キャッシュに置く
+- パスワードのハッシュなど秘密の値（UNCACHED_FIELDS）はキャッシュに置かない
+  （遅延読み込みのフィールドになり、使うときだけ DB から読む。セッションの確認に使う
+  get_session_auth_hash() の値は一緒に置いておく。models.CustomUser.get_session_auth_hash）
+- ユーザーの保存・削除でキャッシュを捨てる（app/signals.py）
+  QuerySet.update() / bulk_update() はシグナルを送らないので、is_active などを update() で変えても
+  USER_CACHE_TIMEOUT の間は古いまま。update() でユーザーを変えるときは forget_user() も呼ぶ
+- MoveInfo 側の変更は世帯キャッシュのバージョン（app/household_cache.py）で検知する
+"""
+import copy
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+from .household_cache import get_version
+
+# キャッシュしたユーザーの有効期限（秒）
+USER_CACHE_TIMEOUT = 60 * 60
+
+# キャッシュに置かないユーザーのフィールド
+UNCACHED_FIELDS = ("password", "email_change_token")
+
+
+def _user_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+def _household_version(move_info_id):
+    return get_version(move_info_id) if move_info_id else None
+
+
+def forget_user(user_id, using=None):
+    """コミット後にユーザーのキャッシュを捨てる（パスワード変更なども含め、保存のたびに呼ぶ）"""
+    transaction.on_commit(lambda: cache.delete(_user_key(user_id)), using=using)
+
+
+def _without_secrets(user):
+    """UNCACHED_FIELDS を除いたユーザーのコピー（除いたフィールドは遅延読み込みになる）"""
+    user = copy.copy(user)
+    for name in UNCACHED_FIELDS:
+        user.__dict__.pop(name, None)
+    return user
+
+
+def _cacheable(user):
+    """キャッシュに置くユーザー（世帯のオーナーも秘密の値を除く）"""
+    cached = _without_secrets(user)
+    cached._session_auth_hash = user.get_session_auth_hash()
+    if user.move_info is not None:
+        move_info = copy.copy(user.move_info)
+        if move_info.owner is not None:
+            move_info.owner = _without_secrets(move_info.owner)
+        cached.move_info = move_info
+    return cached
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend の get_user() を MoveInfo・オーナーごとキャッシュする"""
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        move_info_id = version = None
+
+        cached = cache.get(key)
+        if cached is not None:
+            move_info_id, cached_version, user = cached
+            # 世帯のバージョンが変わっていなければ MoveInfo もそのまま使える
+            version = _household_version(move_info_id)
+            if version == cached_version:
+                return user if self.user_can_authenticate(user) else None
+
+        UserModel = get_user_model()
+        user = (
+            UserModel._default_manager.select_related("move_info__owner")
+            .filter(pk=user_id)
+            .first()
+        )
+        if user is None:
+            return None
+
+        # バージョンは読み込み前に確認したものを使う（読み込み中の変更を取りこぼさない）
+        if cached is None or user.move_info_id != move_info_id:
+            version = _household_version(user.move_info_id)
+        cache.set(key, (user.move_info_id, version, _cacheable(user)), USER_CACHE_TIMEOUT)
+
+        return user if self.user_can_authenticate(user) else None
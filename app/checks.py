@@ -0,0 +1,67 @@
+# app/checks.py
+"""
+ホットなクエリのクエリプランのチェック
+`python manage.py check --database default` で実行する
+"""
+import re
+from datetime import date
+
+from django.core.checks import Error, Tags, Warning, register
+from django.db import DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from . import queries
+
+# フルスキャン（SCAN ...）と一時B-treeでのソート
+BAD_PLAN_PATTERN = re.compile(r"\bSCAN\b(?! CONSTANT ROW)|USE TEMP B-TREE")
+
+
+def hot_querysets():
+    """チェック対象のクエリ（views と同じ形、値はダミー）"""
+    today = date.today()
+    return [
+        ("task_list", queries.task_list_rows(0)),
+        ("calendar", queries.calendar_task_rows(0, today, today)),
+        ("day_tasks", queries.day_task_rows(0, today)),
+        ("calendar_feed", queries.calendar_feed_rows(0)),
+        ("message_board", queries.message_board_rows(0)[:1]),
+        ("message_board_older", queries.message_board_rows(0, cursor=(timezone.now(), 0))[:1]),
+        ("unread_messages", queries.unread_messages(0, 0)),
+    ]
+
+
+@register(Tags.database)
+def check_hot_query_plans(app_configs, databases=None, **kwargs):
+    """ホットなクエリがフルスキャン・一時ソートになっていないか（SQLite のみ）"""
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != "sqlite":
+            continue
+
+        # 未適用のマイグレーションがある（migrate の実行前）なら何もしない
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            continue
+
+        for name, queryset in hot_querysets():
+            try:
+                plan = queryset.using(alias).explain()
+            except DatabaseError as e:
+                errors.append(Warning(
+                    f"クエリプランを取得できませんでした（{alias}: {name}）: {e}",
+                    hint="migrate が済んでいるか確認してください。",
+                    id="app.W001",
+                ))
+                continue
+
+            bad_lines = [line for line in plan.splitlines() if BAD_PLAN_PATTERN.search(line)]
+            if bad_lines:
+                errors.append(Error(
+                    f"ホットなクエリ {name} がインデックスを使えていません（{alias}）: "
+                    + " / ".join(line.strip() for line in bad_lines),
+                    hint="app.models の Meta.indexes とクエリの条件・並び順が合っているか確認してください。",
+                    id="app.E001",
+                ))
+    return errors
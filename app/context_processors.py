@@ -1,14 +1,15 @@
-from .models import Message
+from django.utils.functional import SimpleLazyObject
+
+from .unread import get_unread_count
 
 def unread_message_count(request):
     if not request.user.is_authenticated:
         return {}
 
-    count = Message.objects.filter(
-        receiver=request.user,
-        is_read=False
-    ).count()
+    # テンプレートで参照されたときだけ取得する（通常はキャッシュから）
+    user = request.user
+    count = SimpleLazyObject(lambda: get_unread_count(user))
 
     return {
         "unread_message_count": count
-    }
\ No newline at end of file
+    }
@@ -1,68 +1,199 @@
 # app/email_backend.py
 
+import http.client
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
 import sendgrid
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Bcc, Cc, Header, Mail, Personalization, To
 from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
 
-print("=== SendGrid backend is being used ===")
+# 1回の API 呼び出しに入れられる宛先（personalization）の上限（SendGrid の仕様）
+MAX_PERSONALIZATIONS = 1000
+
+# 送信に使うスレッド数のデフォルト（settings.SENDGRID_MAX_WORKERS で変更できる）
+DEFAULT_MAX_WORKERS = 4
+
+# メール1通ごとの送信結果
+SendResult = namedtuple("SendResult", ["message", "sent", "error"])
+
+
+class SendGridBatchError(Exception):
+    """一部（または全部）のメールが送れなかった"""
+
+    def __init__(self, results):
+        self.results = results
+        failed = [r for r in results if not r.sent]
+        super().__init__(f"{len(failed)}/{len(results)} 通のメール送信に失敗しました: {failed[0].error}")
+
+
+class SendGridAPIError(RuntimeError):
+    """SendGrid API が 2xx 以外を返した（status に HTTP のステータスコード）"""
+
+    def __init__(self, status, content):
+        self.status = status
+        super().__init__(f"SendGrid API error {status}: {content[:500]!r}")
+
+
+class _SendGridTransport:
+    """SendGrid API への HTTP 接続（プロセス内で使い回す。スレッドごとに keep-alive 接続を持つ）"""
+
+    def __init__(self, api_key):
+        # 認証ヘッダ・ホストは公式クライアントのものを使う
+        self.client = sendgrid.SendGridAPIClient(api_key=api_key)
+        self.host = urlsplit(self.client.host).netloc
+        self.headers = dict(self.client._default_headers, **{"Content-Type": "application/json"})
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPSConnection(self.host, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def send(self, mail):
+        """Mail を1回の API 呼び出しで送る（2xx 以外は例外）"""
+        body = json.dumps(mail.get())
+        # keep-alive 接続がサーバー側で切られていた場合に備えて1回だけ張り直す
+        for retry in (True, False):
+            conn = self._connection()
+            try:
+                conn.request("POST", "/v3/mail/send", body=body, headers=self.headers)
+                response = conn.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self._reset()
+                if retry:
+                    continue
+                raise
+            break
+
+        if not 200 <= response.status < 300:
+            raise SendGridAPIError(response.status, content)
+        return response.status
+
+
+_transport = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_transport():
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = _SendGridTransport(settings.SENDGRID_API_KEY)
+        return _transport
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "SENDGRID_MAX_WORKERS", DEFAULT_MAX_WORKERS),
+                thread_name_prefix="sendgrid",
+            )
+        return _executor
+
 
 class SendGridAPIEmailBackend(BaseEmailBackend):
     """
     Django の send_mail() / EmailMessage を
     SendGrid の Web API 経由で送信するバックエンド
+
+    - 件名・本文・差出人が同じメールは personalizations で1回の API 呼び出しにまとめる
+    - まとめた呼び出しが複数ある場合はスレッドプールで並行して送る
+    - 1通ごとの結果は self.results（SendResult のリスト）に残す
     """
 
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently, **kwargs)
+        self.results = []
+
     def send_messages(self, email_messages):
+        self.results = []
         if not email_messages:
             return 0
 
-        sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
-        sent_count = 0
+        chunks = self._build_chunks(email_messages)
+        transport = _get_transport()
 
-        for message in email_messages:
-            # 宛先（to / cc / bcc を全部まとめる）
-            to_list = list(message.to or [])
-            cc_list = list(message.cc or [])
-            bcc_list = list(message.bcc or [])
-            all_to = to_list + cc_list + bcc_list
+        if len(chunks) == 1:
+            self.results.extend(self._send_chunk(transport, *chunks[0]))
+        else:
+            executor = _get_executor()
+            futures = [executor.submit(self._send_chunk, transport, *chunk) for chunk in chunks]
+            for future in futures:
+                self.results.extend(future.result())
+
+        # 失敗があっても全件送り終えてから報告する
+        if not self.fail_silently and any(not r.sent for r in self.results):
+            raise SendGridBatchError(self.results)
+
+        return sum(1 for r in self.results if r.sent)
 
-            if not all_to:
+    def _build_chunks(self, email_messages):
+        """同じ内容のメールをまとめて [(Mail, [message, ...]), ...] にする"""
+        groups = OrderedDict()
+        for message in email_messages:
+            if not (message.to or message.cc or message.bcc):
                 continue
+            key = (
+                message.from_email or settings.DEFAULT_FROM_EMAIL,
+                message.subject,
+                message.body or "",
+                message.content_subtype,
+                tuple(sorted((message.extra_headers or {}).items())),
+            )
+            groups.setdefault(key, []).append(message)
 
-            from_email = message.from_email or settings.DEFAULT_FROM_EMAIL
-
-            # 本文の扱い（テキスト or HTML）
-            body = message.body or ""
-            if message.content_subtype == "html":
-                mail = Mail(
-                    from_email=from_email,
-                    to_emails=all_to,
-                    subject=message.subject,
-                    html_content=body,
-                )
-            else:
-                # プレーンテキスト
-                mail = Mail(
-                    from_email=from_email,
-                    to_emails=all_to,
-                    subject=message.subject,
-                    plain_text_content=body,
-                )
-
-            # ヘッダーがあれば反映（ほぼ使っていないと思うけど一応）
-            if message.extra_headers:
-                mail.headers = message.extra_headers
+        chunks = []
+        for (from_email, subject, body, subtype, headers), messages in groups.items():
+            for start in range(0, len(messages), MAX_PERSONALIZATIONS):
+                batch = messages[start:start + MAX_PERSONALIZATIONS]
+                chunks.append((self._build_mail(from_email, subject, body, subtype, headers, batch), batch))
+        return chunks
 
-            try:
-                response = sg.send(mail)
-                if 200 <= response.status_code < 300:
-                    sent_count += 1
-            except Exception as e:
-                # 失敗してもアプリ全体は落とさない
-                if self.fail_silently:
-                    continue
-                else:
-                    raise e
+    def _build_mail(self, from_email, subject, body, subtype, headers, messages):
+        # 本文の扱い（テキスト or HTML）
+        if subtype == "html":
+            mail = Mail(from_email=from_email, subject=subject, html_content=body)
+        else:
+            mail = Mail(from_email=from_email, subject=subject, plain_text_content=body)
+
+        # 1通 = 1 personalization（宛先はメールごとに別々に見える）
+        for message in messages:
+            personalization = Personalization()
+            # to が無い場合は cc / bcc を宛先にする（personalization には to が必須）
+            for address in message.to or (list(message.cc) + list(message.bcc)):
+                personalization.add_to(To(address))
+            if message.to:
+                for address in message.cc:
+                    personalization.add_cc(Cc(address))
+                for address in message.bcc:
+                    personalization.add_bcc(Bcc(address))
+            mail.add_personalization(personalization)
+
+        for name, value in headers:
+            mail.header = Header(name, value)
+
+        return mail
 
-        return sent_count
\ No newline at end of file
+    def _send_chunk(self, transport, mail, messages):
+        try:
+            transport.send(mail)
+        except Exception as e:
+            return [SendResult(message, False, e) for message in messages]
+        return [SendResult(message, True, None) for message in messages]
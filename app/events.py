@@ -0,0 +1,199 @@
+# app/events.py
+"""
+掲示板のリアルタイム更新（Server-Sent Events）用の pub/sub
+
+- publish() は sync のコード（signals など）から呼ぶ。配信はコミット後
+- subscribe() は SSE の view（app/views_async.py）が使う。MoveInfo ごとに購読する
+- ワーカーが複数あるときは settings.EVENTS_FANOUT_PATH に SQLite ファイルを指定する
+  （publish はファイルに書き、各ワーカーのポーリングスレッドが読み出して自分の購読者に配る）
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# 購読者ごとのキューの上限（溢れたら "resync" を送ってページを読み直させる）
+QUEUE_SIZE = 100
+
+# 複数ワーカー用: ポーリング間隔と、配信済みイベントを残しておく時間（秒）
+FANOUT_POLL_INTERVAL = 0.5
+FANOUT_RETENTION = 60
+
+
+def message_payload(message):
+    """掲示板に表示するメッセージ1件（「さらに読み込む」の JSON と同じ形）"""
+    return {
+        "id": message.pk,
+        "sender_name": message.sender.full_name or "",
+        "receiver_name": message.receiver.full_name or "",
+        "content": message.content,
+        "created_at": timezone.localtime(message.created_at).strftime("%Y/%m/%d %H:%M"),
+    }
+
+
+class Subscription:
+    """SSE の接続1本分（イベントループのキューで受け取る）"""
+
+    def __init__(self, move_info_id, user_id):
+        self.move_info_id = move_info_id
+        self.user_id = user_id
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        """どのスレッドからでも呼べる（user_id 付きのイベントは本人にだけ届ける）"""
+        if event.get("user_id") not in (None, self.user_id):
+            return
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 読み切れないほど溜まったら捨てて、ページごと読み直させる
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait({"type": "resync"})
+
+    async def get(self, timeout):
+        """次のイベント（timeout 秒来なければ asyncio.TimeoutError）"""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class Broker:
+    """プロセス内の pub/sub（MoveInfo ごとの購読者に配る）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, move_info_id, user_id):
+        subscription = Subscription(move_info_id, user_id)
+        with self._lock:
+            self._subscribers[move_info_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.move_info_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.move_info_id]
+
+    def dispatch(self, move_info_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(move_info_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+class SQLiteFanout:
+    """複数ワーカー間の配信（SQLite ファイルを共有のイベントログにする）"""
+
+    def __init__(self, path, broker):
+        self._path = str(path)
+        self._broker = broker
+        self._local = threading.local()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS board_event ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, move_info_id INTEGER NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def publish(self, move_info_id, event):
+        self._connection().execute(
+            "INSERT INTO board_event (move_info_id, payload, created_at) VALUES (?, ?, ?)",
+            (move_info_id, json.dumps(event, ensure_ascii=False), time.time()),
+        )
+
+    def start(self):
+        """ポーリングスレッドを起動する（購読者がいるプロセスだけで動かす）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name="board-events", daemon=True)
+                self._thread.start()
+
+    def _poll(self):
+        conn = self._connection()
+        # 起動より前のイベントは配らない
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM board_event").fetchone()[0]
+        last_prune = 0.0
+        while True:
+            try:
+                rows = conn.execute(
+                    "SELECT id, move_info_id, payload FROM board_event WHERE id > ? ORDER BY id",
+                    (last_id,),
+                ).fetchall()
+                for last_id, move_info_id, payload in rows:
+                    self._broker.dispatch(move_info_id, json.loads(payload))
+
+                now = time.time()
+                if now - last_prune > FANOUT_RETENTION:
+                    conn.execute("DELETE FROM board_event WHERE created_at < ?", (now - FANOUT_RETENTION,))
+                    last_prune = now
+            except sqlite3.Error:
+                # 一時的なロック待ち切れなどは次の周回でやり直す
+                pass
+            time.sleep(FANOUT_POLL_INTERVAL)
+
+
+broker = Broker()
+
+_fanout = None
+_fanout_lock = threading.Lock()
+
+
+def _get_fanout():
+    global _fanout
+    path = getattr(settings, "EVENTS_FANOUT_PATH", None)
+    if not path:
+        return None
+    with _fanout_lock:
+        if _fanout is None:
+            _fanout = SQLiteFanout(path, broker)
+        return _fanout
+
+
+def _send(move_info_id, event):
+    fanout = _get_fanout()
+    if fanout is not None:
+        fanout.publish(move_info_id, event)
+    else:
+        broker.dispatch(move_info_id, event)
+
+
+def publish(move_info_id, event, using=None):
+    """コミット後に MoveInfo の購読者へイベントを配る（event に user_id があればその人だけ）"""
+    if move_info_id is None:
+        return
+    transaction.on_commit(lambda: _send(move_info_id, event), using=using)
+
+
+def subscribe(move_info_id, user_id):
+    """SSE の接続を購読者として登録する（イベントループの中で呼ぶ）"""
+    fanout = _get_fanout()
+    if fanout is not None:
+        fanout.start()
+    return broker.subscribe(move_info_id, user_id)
+
+
+def unsubscribe(subscription):
+    broker.unsubscribe(subscription)
@@ -4,7 +4,7 @@ from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm, Pas
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomUser, Task
-from django.core.mail import EmailMessage
+from .outbox import enqueue_email
 from django.template.loader import render_to_string
 
 User = get_user_model()
@@ -172,11 +172,5 @@ class CustomPasswordResetForm(PasswordResetForm):
         # 本文
         body = render_to_string(email_template_name, context)
 
-        # EmailMessage を使う → SendGrid API が動く
-        email = EmailMessage(
-            subject=subject,
-            body=body,
-            from_email=from_email,
-            to=[to_email]
-        )
-        return email.send()
\ No newline at end of file
+        # Outbox に登録（送信は send_outbox ワーカーが行う）
+        enqueue_email(subject=subject, body=body, to=[to_email], from_email=from_email)
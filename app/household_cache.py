@@ -0,0 +1,88 @@
+# app/household_cache.py
+"""
+世帯（MoveInfo）単位のキャッシュ
+
+- キーに MoveInfo ごとのバージョン番号を入れ、データが変わったらバージョンを上げる
+  （古いキーは参照されなくなり、有効期限で消える）
+- バージョンを上げるのは app/signals.py（Task / Message / CustomUser / MoveInfo の保存・削除）
+- キャッシュが無いときは1リクエストだけが計算し、同時に来た他のリクエストはその結果を待つ
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# キャッシュしたデータの有効期限（秒）。変更時はバージョンで切り替わるので長めでよい
+DATA_TIMEOUT = 60 * 60
+
+# バージョン番号の有効期限（データより長く残す）
+VERSION_TIMEOUT = 60 * 60 * 24
+
+# 計算中ロックの有効期限（計算したリクエストが落ちても詰まらないように）
+LOCK_TIMEOUT = 10
+
+# 他のリクエストの計算結果を待つ最大時間と確認間隔（秒）
+LOCK_WAIT = 3.0
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def _version_key(move_info_id):
+    return f"household_version:{move_info_id}"
+
+
+def get_version(move_info_id):
+    """MoveInfo の現在のバージョン番号"""
+    key = _version_key(move_info_id)
+    version = cache.get(key)
+    if version is None:
+        # 消えたあとに作り直しても以前の番号と重ならないよう時刻から始める
+        cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(move_info_id):
+    """バージョンを上げて、その MoveInfo のキャッシュをすべて無効にする"""
+    try:
+        cache.incr(_version_key(move_info_id))
+    except ValueError:
+        # バージョンが無い＝次回は新しい番号から始まるので何もしなくてよい
+        pass
+
+
+def invalidate_household(move_info_id, using=None):
+    """コミット後にバージョンを上げる
+    （コミット前に上げると、他のリクエストが古いデータを新しいバージョンで保存してしまう）
+    """
+    if move_info_id is None:
+        return
+    transaction.on_commit(lambda: bump_version(move_info_id), using=using)
+
+
+def household_cached(move_info_id, name, compute, timeout=DATA_TIMEOUT):
+    """MoveInfo 単位でキャッシュした compute() の結果を返す"""
+    key = f"household:{move_info_id}:{get_version(move_info_id)}:{name}"
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    # 同時に外れたときは1リクエストだけが計算する
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    # 他のリクエストの計算を待つ（待ちきれなければ自分で計算する）
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    return compute()
@@ -0,0 +1,136 @@
+# app/ics.py
+"""
+カレンダー購読（iCalendar / RFC 5545）の組み立て（views_async.calendar_feed_view）
+
+- 時刻のあるタスクは settings.TIME_ZONE の時刻を UTC にして書く。時刻の無いタスクは終日の予定
+- UID は世帯とタスクの id から作る（同じタスクは購読側で同じ予定として更新される）
+- DTSTAMP は世帯の最終更新時刻（同じデータなら同じ内容になり、ETag とずれない）
+- 1行は 75 オクテットで折り返し、改行は CRLF
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+# カレンダーアプリに表示する名前
+CALENDAR_NAME = "引越しGO"
+
+PRODUCT_ID = "-//hikkoshi-GO//Calendar Feed//JA"
+
+# 購読側に伝える更新間隔（これより短く取りに来ても、変わっていなければ 304 になる）
+REFRESH_INTERVAL = "PT30M"
+
+# 終了時刻の無いタスクの長さ
+DEFAULT_DURATION = timedelta(hours=1)
+
+# 完了したタスクの件名の頭に付ける
+COMPLETED_PREFIX = "【完了】"
+
+UID_DOMAIN = "hikkoshigo"
+
+# 1行の長さの上限（オクテット。CRLF は含まない）
+MAX_LINE_OCTETS = 75
+
+CRLF = "\r\n"
+
+
+def escape_text(value):
+    """TEXT の値のエスケープ（\\ ; , と改行）"""
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+    )
+
+
+def fold(line):
+    """75 オクテットを超える行を折り返す（UTF-8 の文字の途中では切らない）"""
+    if len(line.encode("utf-8")) <= MAX_LINE_OCTETS:
+        return line + CRLF
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        # 2行目からは先頭の空白1つ分を引く
+        if size + width > MAX_LINE_OCTETS - (1 if parts else 0):
+            parts.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return (CRLF + " ").join(parts) + CRLF
+
+
+def _lines(*lines):
+    return "".join(fold(line) for line in lines)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local(day, clock):
+    """タスクの日付と時刻（settings.TIME_ZONE）→ aware な datetime"""
+    return timezone.make_aware(datetime.combine(day, clock), timezone.get_default_timezone())
+
+
+def _date(day):
+    return day.strftime("%Y%m%d")
+
+
+def calendar_header():
+    return _lines(
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODUCT_ID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(CALENDAR_NAME)}",
+        f"X-WR-TIMEZONE:{timezone.get_default_timezone_name()}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}",
+        f"X-PUBLISHED-TTL:{REFRESH_INTERVAL}",
+    )
+
+
+def calendar_footer():
+    return _lines("END:VCALENDAR")
+
+
+def task_event(move_info_id, row, stamp):
+    """タスク1件（queries.calendar_feed_rows の行）の VEVENT"""
+    title = row["custom_task"] or row["task_name"] or ""
+    if row["is_completed"]:
+        title = COMPLETED_PREFIX + title
+
+    if row["start_time"] is None:
+        when = (f"DTSTART;VALUE=DATE:{_date(row['date'])}",
+                f"DTEND;VALUE=DATE:{_date(row['date'] + timedelta(days=1))}")
+    else:
+        start = _local(row["date"], row["start_time"])
+        end = _local(row["date"], row["end_time"]) if row["end_time"] else None
+        if end is None or end <= start:
+            end = start + DEFAULT_DURATION
+        when = (f"DTSTART:{_utc(start)}", f"DTEND:{_utc(end)}")
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:task-{move_info_id}-{row['id']}@{UID_DOMAIN}",
+        f"DTSTAMP:{_utc(stamp)}",
+        *when,
+        f"SUMMARY:{escape_text(title)}",
+    ]
+    if row["memo"]:
+        lines.append(f"DESCRIPTION:{escape_text(row['memo'])}")
+    lines.append("END:VEVENT")
+    return _lines(*lines)
+
+
+def move_day_event(move_info_id, move_date, stamp):
+    """引越し日（終日）の VEVENT"""
+    return _lines(
+        "BEGIN:VEVENT",
+        f"UID:move-day-{move_info_id}@{UID_DOMAIN}",
+        f"DTSTAMP:{_utc(stamp)}",
+        f"DTSTART;VALUE=DATE:{_date(move_date)}",
+        f"DTEND;VALUE=DATE:{_date(move_date + timedelta(days=1))}",
+        "SUMMARY:引越し日",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    )
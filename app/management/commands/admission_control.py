@@ -0,0 +1,60 @@
+# app/management/commands/admission_control.py
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from hikkoshigoproject.admission import LIMIT_FIELDS, OVERRIDES_CACHE_KEY, REFRESH_INTERVAL, effective_limits
+
+
+class Command(BaseCommand):
+    help = (
+        "アドミッション制御の上限（settings.ADMISSION_CONTROL）を再起動せずに変える。"
+        "上書きはキャッシュに入り、各ワーカーが数秒以内に読み直す。引数なしなら今の上限を表示する"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--set",
+            action="append",
+            default=[],
+            metavar="種類.項目=値",
+            help="上書きする値（例: write.concurrency=2、read.timeout=1.5。何回でも指定できる）",
+        )
+        parser.add_argument("--reset", action="store_true", help="上書きを消して settings の値に戻す")
+
+    def handle(self, *args, **options):
+        overrides = {} if options["reset"] else (cache.get(OVERRIDES_CACHE_KEY) or {})
+        for assignment in options["set"]:
+            overrides = self._apply(overrides, assignment)
+
+        if options["reset"] or options["set"]:
+            if overrides:
+                cache.set(OVERRIDES_CACHE_KEY, overrides, timeout=None)
+            else:
+                cache.delete(OVERRIDES_CACHE_KEY)
+            self.stdout.write(self.style.SUCCESS(f"上限を変えました（{REFRESH_INTERVAL:g} 秒以内に反映されます）。"))
+
+        for name, values in effective_limits(overrides).items():
+            changed = overrides.get(name, {})
+            text = "  ".join(
+                f"{field} {values[field]}{' *' if field in changed else ''}" for field in LIMIT_FIELDS
+            )
+            self.stdout.write(f"{name:<8} {text}")
+        if overrides:
+            self.stdout.write("（* はキャッシュで上書きしている値）")
+
+    def _apply(self, overrides, assignment):
+        target, _, value = assignment.partition("=")
+        name, _, field = target.partition(".")
+        if name not in settings.ADMISSION_CONTROL or field not in LIMIT_FIELDS or not value:
+            raise CommandError(
+                f"{assignment!r} は指定できません（種類: {', '.join(settings.ADMISSION_CONTROL)} / "
+                f"項目: {', '.join(LIMIT_FIELDS)}）。"
+            )
+        try:
+            parsed = float(value) if field == "timeout" else int(value)
+        except ValueError:
+            raise CommandError(f"{assignment!r} の値が数値ではありません。")
+        if parsed < 0 or (field == "concurrency" and parsed < 1):
+            raise CommandError(f"{assignment!r} の値が小さすぎます。")
+        return {**overrides, name: {**overrides.get(name, {}), field: parsed}}
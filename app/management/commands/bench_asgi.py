@@ -0,0 +1,197 @@
+# app/management/commands/bench_asgi.py
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count, Q
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.models import Invite, Message, MoveInfo, Task
+from app.shards import for_household
+
+from .bench_views import _git_revision, _percentile
+
+# 計測するルート（app/views_async.py の async 版の view）
+ROUTES = (
+    "day_tasks_json",
+    "toggle_task_completion",
+    "delete_task",
+    "delete_message",
+    "set_move_date",
+    "generate_invite_url",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "async 化した JSON エンドポイントを、WSGI（スレッド）と ASGI（コルーチン）で "
+        "同時接続数を揃えて叩き、スループット（req/s）と p50 / p95 を比べる。"
+        "seed_data のデータで実行する（計測用に作ったタスク・メッセージ・招待は最後に消す）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="1ルート・1方式あたりのリクエスト数（デフォルト: 200）")
+        parser.add_argument("--concurrency", type=int, default=16, help="同時に処理中にするリクエスト数（デフォルト: 16）")
+        parser.add_argument("--routes", nargs="*", choices=sorted(ROUTES), help="計測するルート名（省略時は全部）")
+        parser.add_argument("--email", help="ログインするユーザー（世帯のオーナー。省略時はタスクが最も多い世帯のオーナー）")
+        parser.add_argument("--output", default="bench_asgi_results.json", help="結果の保存先（デフォルト: bench_asgi_results.json）")
+
+    # 同じルートを何百回も叩くのでレート制限・アドミッション制御は外す
+    @override_settings(RATE_LIMITS=None, ADMISSION_CONTROL=None)
+    def handle(self, *args, **options):
+        user = self._pick_owner(options["email"])
+        move_info = user.move_info
+        count, concurrency = options["requests"], options["concurrency"]
+
+        login = Client()
+        login.force_login(user)
+        cookies = login.cookies
+
+        fixtures = self._create_fixtures(user, move_info, count)
+        results = {}
+        try:
+            for name in options["routes"] or ROUTES:
+                results[name] = {}
+                for mode in ("wsgi", "asgi"):
+                    plans = [self._plan(name, fixtures, mode, i) for i in range(count)]
+                    if mode == "wsgi":
+                        r = self._run_wsgi(cookies, plans, concurrency)
+                    else:
+                        r = asyncio.run(self._run_asgi(cookies, plans, concurrency))
+                    results[name][mode] = r
+                    self.stdout.write(
+                        f"{name:<24} {mode}  {r['rps']:8.1f} req/s  p50 {r['p50_ms']:8.2f}ms  "
+                        f"p95 {r['p95_ms']:8.2f}ms  errors {r['errors']}"
+                    )
+        finally:
+            self._cleanup(move_info, fixtures)
+
+        report = {
+            "revision": _git_revision(),
+            "created_at": timezone.now().isoformat(),
+            "requests": count,
+            "concurrency": concurrency,
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"結果を {options['output']} に保存しました。"))
+
+    def _pick_owner(self, email):
+        move_infos = MoveInfo.objects.select_related("owner")
+        if email:
+            move_info = move_infos.filter(owner__email=email).first()
+        else:
+            # タスクは世帯のシャードにあるので、カタログのカウンタで選ぶ
+            move_info = move_infos.order_by("-total_tasks").first()
+        if move_info is None or move_info.owner is None:
+            raise CommandError("計測に使う世帯がありません（先に seed_data を実行してください）。")
+        return move_info.owner
+
+    def _create_fixtures(self, user, move_info, count):
+        """削除・切り替え用のデータ（WSGI / ASGI で別々のものを消す）"""
+        today = timezone.localdate()
+        member = move_info.users.exclude(pk=user.pk).first() or user
+        fixtures = {
+            "move_date": move_info.move_date,
+            "invite_max_pk": for_household(Invite, move_info.pk).order_by("-pk").values_list("pk", flat=True).first() or 0,
+            "task_date": today.isoformat(),
+            "toggle_task": for_household(Task, move_info.pk).create(move_info=move_info, task_name="bench_asgi", date=today).pk,
+            "tasks": {}, "messages": {},
+        }
+        for mode in ("wsgi", "asgi"):
+            fixtures["tasks"][mode] = [
+                for_household(Task, move_info.pk).create(move_info=move_info, task_name="bench_asgi", date=today).pk
+                for _ in range(count)
+            ]
+            fixtures["messages"][mode] = [
+                for_household(Message, move_info.pk).create(sender=user, receiver=member, move_info=move_info, content="bench_asgi").pk
+                for _ in range(count)
+            ]
+        move_info.adjust_task_counters(total=1 + 2 * count)
+        return fixtures
+
+    def _plan(self, name, fixtures, mode, i):
+        """i 番目のリクエスト（メソッド, パス, データ）"""
+        if name == "day_tasks_json":
+            return "get", reverse(name), {"date": fixtures["task_date"]}
+        if name == "toggle_task_completion":
+            return "post", reverse(name, kwargs={"task_id": fixtures["toggle_task"]}), {}
+        if name == "delete_task":
+            return "post", reverse(name, kwargs={"task_id": fixtures["tasks"][mode][i]}), {}
+        if name == "delete_message":
+            return "post", reverse(name, kwargs={"message_id": fixtures["messages"][mode][i]}), {}
+        if name == "set_move_date":
+            move_date = fixtures["move_date"] or timezone.localdate()
+            return "post", reverse(name), {"move_date": move_date.isoformat()}
+        return "post", reverse(name), {}
+
+    def _run_wsgi(self, cookies, plans, concurrency):
+        """スレッドから WSGI のハンドラーで同時に呼ぶ（WSGI のスレッドワーカー相当。async の view は async_to_sync で動く）"""
+        def worker(chunk):
+            client = Client()
+            client.cookies = cookies
+            timings = []
+            try:
+                for method, path, data in chunk:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(path, data)
+                    timings.append((time.perf_counter() - start, response.status_code))
+            finally:
+                connections.close_all()
+            return timings
+
+        chunks = [plans[i::concurrency] for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            timings = [t for chunk in executor.map(worker, chunks) for t in chunk]
+            elapsed = time.perf_counter() - start
+        return self._summary(timings, elapsed)
+
+    async def _run_asgi(self, cookies, plans, concurrency):
+        """ASGI のハンドラーでコルーチンから同時に呼ぶ（ASGI ワーカー1つ相当）"""
+        client = AsyncClient()
+        client.cookies = cookies
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(method, path, data):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await getattr(client, method)(path, data)
+                return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(one(*plan) for plan in plans))
+        elapsed = time.perf_counter() - start
+        return self._summary(timings, elapsed)
+
+    def _summary(self, timings, elapsed):
+        latencies = [t * 1000 for t, _ in timings]
+        return {
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "errors": sum(1 for _, status in timings if status >= 400),
+        }
+
+    def _cleanup(self, move_info, fixtures):
+        """計測用のデータを消し、引越し日とタスクのカウンタを元に戻す"""
+        for_household(Task, move_info.pk).filter(move_info=move_info, task_name="bench_asgi").delete()
+        for_household(Message, move_info.pk).filter(move_info=move_info, content="bench_asgi").delete()
+        for_household(Invite, move_info.pk).filter(move_info=move_info, pk__gt=fixtures["invite_max_pk"]).delete()
+
+        move_info.refresh_from_db()
+        move_info.move_date = fixtures["move_date"]
+        counts = move_info.tasks.aggregate(
+            total=Count("pk"), completed=Count("pk", filter=Q(is_completed=True))
+        )
+        move_info.total_tasks, move_info.completed_tasks = counts["total"], counts["completed"]
+        move_info.save(update_fields=["move_date", "total_tasks", "completed_tasks"])
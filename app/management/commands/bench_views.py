@@ -0,0 +1,206 @@
+# app/management/commands/bench_views.py
+import json
+import logging
+import statistics
+import subprocess
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from app import urls as app_urls
+from app.models import Message, MoveInfo, Task
+from app.shards import db_for_household, for_household, household_aliases
+
+# 計測しないルート（セッションを切ってしまうもの）
+SKIP_ROUTES = {"logout"}
+
+# GET 以外のメソッドやパラメータが必要なルート（ルート名 → (メソッド, データを作る関数)）
+REQUESTS = {
+    "generate_invite_url": ("post", lambda s: {}),
+    "member_remove": ("post", lambda s: {}),
+    "delete_message": ("post", lambda s: {}),
+    "set_move_date": ("post", lambda s: {"move_date": "2030-01-01"}),
+    "save_message": ("post", lambda s: {"receiver_email": s["receiver_email"], "content": "ベンチマーク"}),
+    "message_register": ("post", lambda s: {"receiver": s["user_id"], "content": "ベンチマーク"}),
+    "message_list_more": ("get", lambda s: {"cursor": s["message_cursor"]}),
+    "day_tasks_json": ("get", lambda s: {"date": s["task_date"]}),
+}
+
+
+def _percentile(values, pct):
+    """nearest-rank 方式のパーセンタイル"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "app/urls.py の全ルートをテストクライアントで呼び出し、view ごとの "
+        "p50 / p95 / p99 の処理時間とクエリ数を計測して JSON に保存する"
+        "（各リクエストはロールバックするのでデータは変わらない）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="1ルートあたりの計測回数（デフォルト: 50）")
+        parser.add_argument("--warmup", type=int, default=3, help="計測前の空回し回数（デフォルト: 3）")
+        parser.add_argument("--email", help="ログインするユーザー（省略時はメッセージが最も多い世帯のオーナー）")
+        parser.add_argument("--routes", nargs="*", help="計測するルート名（省略時は全ルート）")
+        parser.add_argument("--output", default="bench_results.json", help="結果の保存先（デフォルト: bench_results.json）")
+        parser.add_argument("--compare", help="比較する過去の結果 JSON（p50 / p95 の差分を表示）")
+
+    # 同じルートを何百回も叩くのでレート制限・アドミッション制御は外す
+    @override_settings(RATE_LIMITS=None, ADMISSION_CONTROL=None)
+    def handle(self, *args, **options):
+        user = self._pick_user(options["email"])
+        move_info = user.move_info
+        client = Client()
+        client.force_login(user)
+
+        sample_kwargs = self._sample_kwargs(user, move_info)
+        # 世帯のデータが入っている DB（シャーディングしていれば default と両方ロールバックする）
+        aliases = sorted({"default", db_for_household(move_info.pk)})
+        results = {}
+        # 404 / 400 などの警告ログで結果が読みにくくならないようにする
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        for pattern in app_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIP_ROUTES:
+                continue
+            if options["routes"] and pattern.name not in options["routes"]:
+                continue
+
+            kwargs = {name: sample_kwargs[name] for name in pattern.pattern.converters}
+            path = reverse(pattern.name, kwargs=kwargs)
+            method, make_data = REQUESTS.get(pattern.name, ("get", lambda s: {}))
+
+            results[pattern.name] = self._bench(client, method, path, make_data(sample_kwargs), aliases, options)
+            r = results[pattern.name]
+            self.stdout.write(
+                f"{pattern.name:<24} {r['status']:>3}  p50 {r['p50_ms']:8.2f}ms  "
+                f"p95 {r['p95_ms']:8.2f}ms  p99 {r['p99_ms']:8.2f}ms  queries {r['queries']}"
+            )
+
+        report = {
+            "revision": _git_revision(),
+            "created_at": timezone.now().isoformat(),
+            "iterations": options["iterations"],
+            "household": {
+                "move_info_id": move_info.pk,
+                "tasks": for_household(Task, move_info.pk).filter(move_info=move_info).count(),
+                "messages": for_household(Message, move_info.pk).filter(move_info=move_info).count(),
+            },
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"結果を {options['output']} に保存しました。"))
+
+        if options["compare"]:
+            self._print_comparison(json.loads(Path(options["compare"]).read_text()), report)
+
+    def _pick_user(self, email):
+        if email:
+            move_info = MoveInfo.objects.filter(users__email=email).first()
+        else:
+            # メッセージは世帯のシャードにあるので、シャードごとの最多から選ぶ
+            busiest = max(
+                (
+                    row
+                    for alias in household_aliases()
+                    for row in Message.objects.using(alias)
+                    .values("move_info_id")
+                    .annotate(message_count=Count("pk"))
+                    .order_by("-message_count")[:1]
+                ),
+                key=lambda row: row["message_count"],
+                default=None,
+            )
+            move_info = MoveInfo.objects.filter(pk=busiest["move_info_id"]).first() if busiest else None
+        if move_info is None:
+            raise CommandError("計測に使う世帯がありません（先に seed_data を実行してください）。")
+        return move_info.owner if not email else move_info.users.get(email=email)
+
+    def _sample_kwargs(self, user, move_info):
+        """URL のパラメータに使う実在のデータ"""
+        member = move_info.users.exclude(pk=user.pk).first() or user
+        task = for_household(Task, move_info.pk).filter(move_info=move_info).first()
+        message = for_household(Message, move_info.pk).filter(move_info=move_info, sender=user).order_by("-created_at").first()
+        return {
+            "task_id": task.pk if task else 0,
+            "task_date": task.date.isoformat() if task else timezone.localdate().isoformat(),
+            "message_id": message.pk if message else 0,
+            "message_cursor": f"{message.created_at.isoformat()}_{message.pk}" if message else "",
+            "user_id": member.pk,
+            "receiver_email": member.email,
+            "token": uuid.uuid4(),
+        }
+
+    def _bench(self, client, method, path, data, aliases, options):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries[-1] += 1
+            return execute(sql, params, many, context)
+
+        timings = []
+        status = None
+        with ExitStack() as wrappers:
+            for alias in aliases:
+                wrappers.enter_context(connections[alias].execute_wrapper(count_queries))
+            for i in range(options["warmup"] + options["iterations"]):
+                queries.append(0)
+                # 各リクエストはロールバックしてデータを元に戻す
+                with ExitStack() as atomics:
+                    for alias in aliases:
+                        atomics.enter_context(transaction.atomic(using=alias))
+                    start = time.perf_counter()
+                    response = getattr(client, method)(path, data)
+                    elapsed = time.perf_counter() - start
+                    for alias in aliases:
+                        transaction.set_rollback(True, using=alias)
+                status = response.status_code
+                if i >= options["warmup"]:
+                    timings.append(elapsed * 1000)
+                else:
+                    queries.pop()
+
+        return {
+            "path": path,
+            "method": method.upper(),
+            "status": status,
+            "p50_ms": round(_percentile(timings, 50), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "p99_ms": round(_percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": max(queries),
+        }
+
+    def _print_comparison(self, before, after):
+        self.stdout.write(f"\n比較: {before.get('revision')} → {after.get('revision')}")
+        for name, r in after["results"].items():
+            old = before.get("results", {}).get(name)
+            if not old:
+                continue
+            self.stdout.write(
+                f"{name:<24} p50 {r['p50_ms'] - old['p50_ms']:+8.2f}ms  "
+                f"p95 {r['p95_ms'] - old['p95_ms']:+8.2f}ms  queries {r['queries'] - old['queries']:+d}"
+            )
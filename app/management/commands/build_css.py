@@ -0,0 +1,142 @@
+# app/management/commands/build_css.py
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 全ページ共通の CSS（各バンドルの先頭に入る）
+COMMON_CSS = "common.css"
+
+# ファーストビューに入る要素のセレクタ（これで始まるルールをクリティカル CSS として HTML に埋め込む）
+CRITICAL_SELECTORS = re.compile(
+    r"^(?:html|body|main|h1|h2|\*|:root|\.navbar|\.logo|\.nav-links|\.nav-message|\.badge|\.main-content"
+    r"|\.[\w-]+-(?:wrapper|container|header))(?![\w-])"
+)
+
+# そのまま残す @ ルール（変数・フォントなど、後から読み込むと表示が崩れるもの）
+ALWAYS_CRITICAL_AT_RULES = ("@charset", "@import", "@font-face")
+
+# 文字列リテラル
+_STRING_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+
+
+def minify_css(css):
+    """コメント・余分な空白・最後のセミコロンを取り除く（文字列リテラルの中は触らない）"""
+    out, plain, i = [], [], 0
+    while i < len(css):
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end < 0 else end + 2
+            continue
+        match = _STRING_RE.match(css, i) if css[i] in "\"'" else None
+        if match:
+            out.append(_minify_plain("".join(plain)))
+            out.append(match.group())
+            plain, i = [], match.end()
+        else:
+            plain.append(css[i])
+            i += 1
+    out.append(_minify_plain("".join(plain)))
+    return "".join(out).strip()
+
+
+def _minify_plain(text):
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}")
+
+
+def _split_blocks(css):
+    """最上位の (前置き, 中身) と、ブロックを持たない文（@import など）に分ける"""
+    blocks, depth, start, prelude_end = [], 0, 0, None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            match = _STRING_RE.match(css, i)
+            i = match.end() if match else i + 1
+            continue
+        if char == "{":
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif char == ";" and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def critical_css(css):
+    """ファーストビューに必要なルールだけを取り出す（css は minify 済み）"""
+    kept = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            if prelude.startswith(ALWAYS_CRITICAL_AT_RULES):
+                kept.append(prelude + ";")
+        elif prelude.startswith(ALWAYS_CRITICAL_AT_RULES):
+            kept.append(f"{prelude}{{{body}}}")
+        elif prelude.startswith(("@media", "@supports")):
+            inner = critical_css(body)
+            if inner:
+                kept.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            continue
+        elif any(CRITICAL_SELECTORS.match(selector.strip()) for selector in prelude.split(",")):
+            kept.append(f"{prelude}{{{body}}}")
+    return "".join(kept)
+
+
+class Command(BaseCommand):
+    help = (
+        "common.css と各ページの CSS を1ファイルにまとめて minify し、"
+        "ファーストビュー用のクリティカル CSS と一緒に ASSET_BUILD_DIR/bundles/ に書き出す"
+        "（読み込みはテンプレートタグ css_bundle。ハッシュ付きのファイル名は collectstatic で付く）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(Path(settings.BASE_DIR) / "app" / "static" / "css"),
+            help="元の CSS のディレクトリ（デフォルト: app/static/css）",
+        )
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        common_path = source / COMMON_CSS
+        if not common_path.exists():
+            raise CommandError(f"{common_path} がありません。")
+
+        output = Path(settings.ASSET_BUILD_DIR) / "bundles"
+        output.mkdir(parents=True, exist_ok=True)
+
+        common = minify_css(common_path.read_text(encoding="utf-8"))
+        pages = {"common": ""}
+        for path in sorted(source.glob("*.css")):
+            if path.name != COMMON_CSS:
+                pages[path.stem] = minify_css(path.read_text(encoding="utf-8"))
+
+        original_size = sum(p.stat().st_size for p in source.glob("*.css"))
+        bundled_size = 0
+        for name, page_css in pages.items():
+            bundle = common + page_css
+            (output / f"{name}.css").write_text(bundle, encoding="utf-8")
+            (output / f"{name}.critical.css").write_text(critical_css(bundle), encoding="utf-8")
+            bundled_size += len(bundle.encode())
+
+        (output / "manifest.json").write_text(
+            json.dumps({"bundles": sorted(pages)}, indent=2), encoding="utf-8"
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(pages)} 個のバンドルを {output} に書き出しました"
+            f"（元の CSS {original_size:,} バイト → バンドル1個あたり平均 {bundled_size // len(pages):,} バイト）。"
+        ))
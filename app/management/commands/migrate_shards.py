@@ -0,0 +1,32 @@
+# app/management/commands/migrate_shards.py
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from app.shards import shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "シャードの SQLite（settings.DATABASE_SHARD_DIR）を作り、すべてのシャードに migrate を実行する"
+        "（シャードには世帯のテーブルだけが作られる。カタログは通常の migrate で）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("app_label", nargs="?", help="migrate に渡すアプリ名")
+        parser.add_argument("migration_name", nargs="?", help="migrate に渡すマイグレーション名")
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if not aliases:
+            raise CommandError("シャードがありません（DATABASE_SHARDS を設定してください）。")
+
+        Path(settings.DATABASE_SHARD_DIR).mkdir(parents=True, exist_ok=True)
+        migrate_args = [arg for arg in (options["app_label"], options["migration_name"]) if arg]
+        for alias in aliases:
+            self.stdout.write(f"--- {alias} ---")
+            call_command("migrate", *migrate_args, database=alias, verbosity=options["verbosity"])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(aliases)} 個のシャードを migrate しました。"))
@@ -0,0 +1,166 @@
+# app/management/commands/optimize_images.py
+import json
+import re
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow が無ければ SVG だけ最適化する
+    Image = None
+
+# 書き出す横幅（px）。元画像より大きいものは作らない（元の幅は必ず作る）
+RASTER_WIDTHS = (480, 768, 1080, 1440)
+
+# 再エンコードの品質
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+RASTER_EXTENSIONS = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+# 数値を丸める属性（座標・大きさ・パス）
+NUMERIC_ATTRIBUTES = (
+    "d", "points", "transform", "x", "y", "x1", "y1", "x2", "y2",
+    "cx", "cy", "r", "rx", "ry", "width", "height", "viewBox",
+)
+
+_NUMBER_RE = re.compile(r"-?\d*\.\d+(?:[eE]-?\d+)?")
+_NUMERIC_ATTRIBUTE_RE = re.compile(r'(\s(?:%s))="([^"]*)"' % "|".join(NUMERIC_ATTRIBUTES))
+
+
+def _round_numbers(text, precision):
+    def repl(match):
+        value = f"{round(float(match.group()), precision):.{precision}f}".rstrip("0").rstrip(".")
+        return "0" if value in ("-0", "") else value
+    return _NUMBER_RE.sub(repl, text)
+
+
+def _shorten_path(d, precision):
+    """M 10 20 L 30.000 -40 → M10 20L30-40"""
+    d = _round_numbers(d, precision)
+    d = re.sub(r"\s*,\s*", ",", d)
+    d = re.sub(r"\s*([MmLlHhVvCcSsQqTtAaZz])\s*", r"\1", d)
+    d = re.sub(r"\s+", " ", d)
+    return re.sub(r"[ ,](?=-)", "", d).strip()
+
+
+def minify_svg(svg, precision=2):
+    """
+    SVG を小さくする
+    - コメント・DOCTYPE・エディタのメタデータ（draw.io の content 属性、<metadata>）を削除
+    - draw.io の <switch> にある代替画像（foreignObject を描けない環境向けの PNG）を削除
+    - 座標の桁を precision まで丸め、パスの空白を詰める
+    """
+    svg = re.sub(r"<!--.*?-->", "", svg, flags=re.S)
+    svg = re.sub(r"<!DOCTYPE[^>]*>", "", svg)
+    svg = re.sub(r"<metadata\b.*?</metadata>", "", svg, flags=re.S)
+    svg = re.sub(r'(<svg\b[^>]*?)\s+content="[^"]*"', r"\1", svg, count=1)
+    svg = re.sub(r"(</foreignObject>)<image\b[^>]*/>(</switch>)", r"\1\2", svg)
+
+    def repl(match):
+        name, value = match.groups()
+        if name.strip() == "d":
+            return f'{name}="{_shorten_path(value, precision)}"'
+        return f'{name}="{_round_numbers(value, precision)}"'
+    svg = _NUMERIC_ATTRIBUTE_RE.sub(repl, svg)
+
+    # 改行を含むタグ間の空白だけ詰める（テキストの間の空白は残す）
+    svg = re.sub(r">\s*\n\s*<", "><", svg)
+    return svg.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "app/static/img の画像を最適化して ASSET_BUILD_DIR/optimized/ に書き出す。"
+        "SVG はメタデータを削って minify、PNG / JPEG は横幅ごとに縮小して WebP と元の形式で再エンコードする"
+        "（Pillow が必要。無ければ SVG だけ）。読み込みはテンプレートタグ responsive_img / image_url"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(Path(settings.BASE_DIR) / "app" / "static" / "img"),
+            help="元の画像のディレクトリ（デフォルト: app/static/img）",
+        )
+        parser.add_argument("--widths", type=int, nargs="*", default=list(RASTER_WIDTHS), help="書き出す横幅（px）")
+        parser.add_argument("--precision", type=int, default=2, help="SVG の座標の小数点以下の桁数（デフォルト: 2）")
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        if not source.is_dir():
+            raise CommandError(f"{source} がありません。")
+
+        output = Path(settings.ASSET_BUILD_DIR) / "optimized"
+        manifest = {}
+        for path in sorted(source.rglob("*")):
+            extension = path.suffix.lower()
+            name = f"img/{path.relative_to(source).as_posix()}"
+            if extension == ".svg":
+                manifest[name] = self._optimize_svg(path, name, output, options["precision"])
+            elif extension in RASTER_EXTENSIONS:
+                if Image is None:
+                    self.stderr.write(f"Pillow が無いので {name} はそのまま使います。")
+                    continue
+                manifest[name] = self._optimize_raster(path, name, output, sorted(options["widths"]))
+
+        output.mkdir(parents=True, exist_ok=True)
+        (output / "images.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"{len(manifest)} 個の画像を {output} に書き出しました。"))
+
+    def _write(self, output, name, data):
+        path = output / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return f"optimized/{name}"
+
+    def _optimize_svg(self, path, name, output, precision):
+        original = path.read_bytes()
+        minified = minify_svg(original.decode("utf-8"), precision).encode("utf-8")
+        self._report(name, len(original), len(minified))
+        return {"src": self._write(output, name, minified)}
+
+    def _optimize_raster(self, path, name, output, widths):
+        """横幅ごとに WebP と元の形式で書き出す"""
+        content_type = RASTER_EXTENSIONS[path.suffix.lower()]
+        with Image.open(path) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+        width, height = image.size
+        stem = Path(name).with_suffix("")
+
+        sources = {"image/webp": [], content_type: []}
+        webp_size = 0
+        for target in sorted({w for w in widths if w < width} | {width}):
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), Image.Resampling.LANCZOS
+            )
+            for variant_type, data in self._encode(resized, content_type).items():
+                extension = ".webp" if variant_type == "image/webp" else path.suffix.lower()
+                variant = self._write(output, f"{stem}.{target}w{extension}", data)
+                sources[variant_type].append([target, variant])
+                if target == width and variant_type == "image/webp":
+                    webp_size = len(data)
+
+        self._report(name, path.stat().st_size, webp_size)
+        return {"width": width, "height": height, "type": content_type, "sources": sources}
+
+    def _encode(self, image, content_type):
+        """{content_type: バイト列}（WebP と元の形式）"""
+        encoded = {}
+        buffer = BytesIO()
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=6)
+        encoded["image/webp"] = buffer.getvalue()
+
+        buffer = BytesIO()
+        if content_type == "image/jpeg":
+            image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(buffer, "PNG", optimize=True)
+        encoded[content_type] = buffer.getvalue()
+        return encoded
+
+    def _report(self, name, before, after):
+        self.stdout.write(f"{name:<32} {before:>10,} → {after:>10,} バイト")
@@ -0,0 +1,57 @@
+# app/management/commands/rebalance_shards.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.household_cache import invalidate_household
+from app.models import MoveInfo
+from app.shards import db_for_household, move_household, shard_aliases, shard_count
+
+
+class Command(BaseCommand):
+    help = (
+        "シャードの数を変えたあとに、世帯のデータ（タスク・メッセージ・招待・既読位置）を新しいシャードに移す。"
+        "先に migrate_shards で新しいシャードを作っておくこと。移した行の id は振り直される"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from-shards",
+            type=int,
+            default=settings.DATABASE_SHARDS_PREVIOUS,
+            help="移動元のシャード数（0 はシャーディング前の default。デフォルト: DATABASE_SHARDS_PREVIOUS）",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="移す世帯を表示するだけ")
+
+    def handle(self, *args, **options):
+        previous = options["from_shards"]
+        aliases = set(shard_aliases())
+        missing = {db_for_household(i, previous) for i in range(previous)} - aliases - {"default"}
+        if missing:
+            raise CommandError(
+                f"移動元のシャード {', '.join(sorted(missing))} が settings にありません"
+                "（DATABASE_SHARDS_PREVIOUS を設定してください）。"
+            )
+        if previous == shard_count():
+            self.stdout.write("シャードの数が変わっていないので、移すものはありません。")
+            return
+
+        moved = 0
+        for move_info_id in MoveInfo.objects.order_by("pk").values_list("pk", flat=True).iterator():
+            source = db_for_household(move_info_id, previous)
+            target = db_for_household(move_info_id)
+            if source == target:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"MoveInfo {move_info_id}: {source} → {target}")
+            else:
+                counts = move_household(move_info_id, source, target)
+                if counts is None:
+                    continue
+                invalidate_household(move_info_id)
+                self.stdout.write(
+                    f"MoveInfo {move_info_id}: {source} → {target} "
+                    + " ".join(f"{name} {count}" for name, count in counts.items())
+                )
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{moved} 世帯のデータを移しました。"))
@@ -0,0 +1,36 @@
+# app/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app import search
+from app.shards import household_aliases
+
+
+class Command(BaseCommand):
+    help = "メッセージ・タスクの全文検索の索引（app_search_index）を作り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            help="対象のデータベース（省略時は世帯のデータが入っている全 DB。シャーディングしていなければ default）",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="1回に読み込む件数（デフォルト: 500）",
+        )
+
+    def handle(self, *args, **options):
+        for using in [options["database"]] if options["database"] else household_aliases():
+            if not search.is_available(using):
+                raise CommandError(
+                    f"{using} では全文検索が使えません（SQLite で migrate 済みか確認してください）。"
+                )
+
+            with transaction.atomic(using=using):
+                message_count, task_count = search.rebuild(using, options["batch_size"])
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{using} の索引を作り直しました（メッセージ {message_count} 件、タスク {task_count} 件）。"
+            ))
@@ -0,0 +1,64 @@
+# app/management/commands/recount_task_progress.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from app.household_cache import invalidate_household
+from app.models import MoveInfo, Task
+from app.shards import db_for_household
+
+
+def _group_by_alias(move_info_ids):
+    """{DB エイリアス: [MoveInfo の id, ...]}"""
+    groups = {}
+    for move_info_id in move_info_ids:
+        groups.setdefault(db_for_household(move_info_id), []).append(move_info_id)
+    return groups
+
+
+class Command(BaseCommand):
+    help = "MoveInfo のタスク進捗カウンタ（total_tasks / completed_tasks）を実際のタスクから数え直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="1回のトランザクションで処理する MoveInfo の件数（デフォルト: 500）",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = list(MoveInfo.objects.order_by("pk").values_list("pk", flat=True))
+
+        fixed = 0
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                # 集計とズレの修正を同じトランザクションで行う（タスクは世帯のシャードで数える）
+                batch = ids[start:start + batch_size]
+                actual = {}
+                for alias, move_info_ids in _group_by_alias(batch).items():
+                    rows = (
+                        Task.objects.using(alias).filter(move_info_id__in=move_info_ids)
+                        .values("move_info_id")
+                        .annotate(total=Count("pk"), completed=Count("pk", filter=Q(is_completed=True)))
+                    )
+                    for row in rows:
+                        actual[row["move_info_id"]] = (row["total"], row["completed"])
+                move_infos = MoveInfo.objects.filter(pk__in=batch).only("pk", "total_tasks", "completed_tasks")
+
+                drifted = []
+                for move_info in move_infos:
+                    counts = actual.get(move_info.pk, (0, 0))
+                    if (move_info.total_tasks, move_info.completed_tasks) != counts:
+                        move_info.total_tasks, move_info.completed_tasks = counts
+                        drifted.append(move_info)
+
+                MoveInfo.objects.bulk_update(drifted, ["total_tasks", "completed_tasks"])
+                for move_info in drifted:
+                    invalidate_household(move_info.pk)
+                fixed += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(ids)} 件の MoveInfo を確認し、{fixed} 件のカウンタを修正しました。"
+        ))
@@ -0,0 +1,143 @@
+# app/management/commands/seed_data.py
+import random
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app import search
+from app.models import CustomUser, Invite, Message, MessageReadState, MoveInfo, Task
+from app.shards import db_for_household, household_aliases
+
+
+def _bulk_create_by_household(model, objs, batch_size):
+    """世帯のシャードごとに分けて bulk_create する（bulk_create はルーターで振り分けられない）"""
+    groups = {}
+    for obj in objs:
+        groups.setdefault(db_for_household(obj.move_info_id), []).append(obj)
+    for alias, group in groups.items():
+        model.objects.using(alias).bulk_create(group, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = "ベンチマーク用に、本番規模のダミーデータ（世帯・メンバー・タスク・メッセージ・招待）をまとめて作る"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--households", type=int, default=10, help="作成する世帯（MoveInfo）の数（デフォルト: 10）")
+        parser.add_argument("--members", type=int, default=3, help="1世帯あたりのメンバー数（オーナー含む、デフォルト: 3）")
+        parser.add_argument("--tasks", type=int, default=50, help="1世帯あたりのタスク数（デフォルト: 50）")
+        parser.add_argument("--messages", type=int, default=200, help="1世帯あたりのメッセージ数（デフォルト: 200）")
+        parser.add_argument("--invites", type=int, default=2, help="1世帯あたりの招待数（デフォルト: 2）")
+        parser.add_argument("--password", default="Seed-Password1!", help="作成するユーザー共通のパスワード")
+        parser.add_argument("--seed", type=int, default=None, help="乱数のシード（同じデータを作り直す場合）")
+        parser.add_argument("--batch-size", type=int, default=1000, help="bulk_create の1回あたりの件数（デフォルト: 1000）")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        members_per_household = max(options["members"], 1)
+        now = timezone.now()
+
+        # 既存ユーザーとメールアドレスが重ならないように実行ごとの接頭辞を付ける
+        run_id = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+        # ハッシュ計算は重いので全員同じパスワードを1回だけハッシュする
+        password = make_password(options["password"])
+        task_names = [value for value, _ in Task.TASK_CHOICES]
+
+        with ExitStack() as stack:
+            for alias in {"default", *household_aliases()}:
+                stack.enter_context(transaction.atomic(using=alias))
+            users = CustomUser.objects.bulk_create(
+                [
+                    CustomUser(
+                        email=f"seed-{run_id}-{h}-{m}@example.com",
+                        full_name=f"テスト{h}-{m}",
+                        password=password,
+                    )
+                    for h in range(options["households"])
+                    for m in range(members_per_household)
+                ],
+                batch_size=batch_size,
+            )
+            households = [
+                users[h * members_per_household:(h + 1) * members_per_household]
+                for h in range(options["households"])
+            ]
+
+            move_infos = MoveInfo.objects.bulk_create(
+                [
+                    MoveInfo(
+                        owner=members[0],
+                        updated_by=members[0],
+                        move_date=(now + timedelta(days=rng.randint(7, 120))).date(),
+                    )
+                    for members in households
+                ],
+                batch_size=batch_size,
+            )
+
+            for move_info, members in zip(move_infos, households):
+                for user in members:
+                    user.move_info = move_info
+            CustomUser.objects.bulk_update(users, ["move_info"], batch_size=batch_size)
+
+            tasks, messages, invites, read_states = [], [], [], []
+            for move_info, members in zip(move_infos, households):
+                for _ in range(options["tasks"]):
+                    start_hour = rng.randint(8, 18)
+                    is_completed = rng.random() < 0.4
+                    tasks.append(Task(
+                        move_info=move_info,
+                        created_by=rng.choice(members),
+                        task_name=rng.choice(task_names),
+                        date=move_info.move_date - timedelta(days=rng.randint(-14, 60)),
+                        start_time=f"{start_hour:02d}:00",
+                        end_time=f"{start_hour + 1:02d}:00",
+                        memo=rng.choice(["", "忘れずに連絡する", "書類を持っていく", "午前中に対応"]),
+                        is_completed=is_completed,
+                    ))
+                    move_info.total_tasks += 1
+                    move_info.completed_tasks += is_completed
+
+                for _ in range(options["messages"]):
+                    sender = rng.choice(members)
+                    receiver = rng.choice([m for m in members if m != sender] or members)
+                    messages.append(Message(
+                        move_info=move_info,
+                        sender=sender,
+                        receiver=receiver,
+                        content=rng.choice(["段ボールを買ってきました", "ガスの立ち会いお願いします", "粗大ごみの予約をしました", "転出届を出しました"]),
+                        created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                    ))
+
+                # 既読位置（最近の数日分が未読になる）
+                for user in members:
+                    read_states.append(MessageReadState(
+                        user=user,
+                        move_info=move_info,
+                        last_read_at=now - timedelta(days=rng.randint(0, 3)),
+                    ))
+
+                for _ in range(options["invites"]):
+                    invites.append(Invite(move_info=move_info, expires_at=now + timedelta(hours=24)))
+
+            _bulk_create_by_household(Task, tasks, batch_size)
+            _bulk_create_by_household(Message, messages, batch_size)
+            _bulk_create_by_household(Invite, invites, batch_size)
+            _bulk_create_by_household(MessageReadState, read_states, batch_size)
+            MoveInfo.objects.bulk_update(move_infos, ["total_tasks", "completed_tasks"], batch_size=batch_size)
+
+            # bulk_create はシグナルを送らないので、全文検索の索引はまとめて作り直す
+            for alias in household_aliases():
+                if search.is_available(alias):
+                    search.rebuild(alias, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"世帯 {len(move_infos)} / ユーザー {len(users)} / タスク {len(tasks)} / "
+            f"メッセージ {len(messages)} / 招待 {len(invites)} 件を作成しました"
+            f"（ログイン: seed-{run_id}-0-0@example.com / {options['password']}）。"
+        ))
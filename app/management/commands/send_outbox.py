@@ -0,0 +1,51 @@
+# app/management/commands/send_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import outbox
+
+
+class Command(BaseCommand):
+    help = "Outbox（OutboxEmail）に溜まったメールをまとめて送信する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="1回に取り出す件数（デフォルト: 50）",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=outbox.MAX_ATTEMPTS,
+            help=f"送信を試みる最大回数。超えたら dead にする（デフォルト: {outbox.MAX_ATTEMPTS}）",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="終了せずに送信を続ける（ワーカーとして常駐させる場合）",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="--loop 時、送信対象が無いときに待つ秒数（デフォルト: 5）",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # 送信対象が無くなるまでバッチを繰り返す
+            while True:
+                result = outbox.process_batch(options["batch_size"], options["max_attempts"])
+                if any(result.values()):
+                    self.stdout.write(
+                        f"送信 {result['sent']} 件 / 再送予定 {result['retry']} 件 / 送信失敗 {result['dead']} 件"
+                    )
+                if sum(result.values()) < options["batch_size"]:
+                    break
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_task_counters(apps, schema_editor):
+    """既存の MoveInfo にタスク数を反映する"""
+    MoveInfo = apps.get_model("app", "MoveInfo")
+    move_infos = list(MoveInfo.objects.annotate(
+        actual_total=Count("tasks"),
+        actual_completed=Count("tasks", filter=Q(tasks__is_completed=True)),
+    ))
+    for move_info in move_infos:
+        move_info.total_tasks = move_info.actual_total
+        move_info.completed_tasks = move_info.actual_completed
+    MoveInfo.objects.bulk_update(move_infos, ["total_tasks", "completed_tasks"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_remove_customuser_group_message_is_read_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moveinfo",
+            name="total_tasks",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="moveinfo",
+            name="completed_tasks",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_task_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+CREATE_SEARCH_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS app_search_index USING fts5(
+    title,
+    body,
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    move_info_id UNINDEXED,
+    tokenize = 'trigram'
+)
+"""
+
+# rowid はメッセージ = id * 2、タスク = id * 2 + 1（app/search.py と合わせる）
+FILL_MESSAGES = """
+INSERT INTO app_search_index (rowid, kind, object_id, move_info_id, title, body)
+SELECT m.id * 2, 'message', m.id, m.move_info_id,
+       COALESCE(s.full_name, '') || ' ' || COALESCE(r.full_name, ''), m.content
+FROM app_message m
+INNER JOIN app_customuser s ON s.id = m.sender_id
+INNER JOIN app_customuser r ON r.id = m.receiver_id
+"""
+
+FILL_TASKS = """
+INSERT INTO app_search_index (rowid, kind, object_id, move_info_id, title, body)
+SELECT t.id * 2 + 1, 'task', t.id, t.move_info_id,
+       TRIM(t.task_name || ' ' || COALESCE(t.custom_task, '')), t.memo
+FROM app_task t
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """全文検索の索引を作って既存データを入れる（SQLite のみ）"""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_SEARCH_INDEX)
+    schema_editor.execute(FILL_MESSAGES)
+    schema_editor.execute(FILL_TASKS)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS app_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_task_message_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
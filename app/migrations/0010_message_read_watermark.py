@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min, Q
+
+
+def is_read_to_watermark(apps, schema_editor):
+    """is_read から (受信者, MoveInfo) ごとの既読位置を作る
+    - 未読がある: 最も古い未読の直前（それ以降はすべて未読になる）
+    - 未読がない: 最新のメッセージ
+    """
+    Message = apps.get_model("app", "Message")
+    MessageReadState = apps.get_model("app", "MessageReadState")
+
+    rows = (
+        Message.objects.values("receiver_id", "move_info_id")
+        .annotate(
+            first_unread=Min("created_at", filter=Q(is_read=False)),
+            latest=Max("created_at"),
+        )
+    )
+    MessageReadState.objects.bulk_create(
+        [
+            MessageReadState(
+                user_id=row["receiver_id"],
+                move_info_id=row["move_info_id"],
+                last_read_at=(
+                    row["first_unread"] - timedelta(microseconds=1)
+                    if row["first_unread"] else row["latest"]
+                ),
+            )
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+def watermark_to_is_read(apps, schema_editor):
+    Message = apps.get_model("app", "Message")
+    MessageReadState = apps.get_model("app", "MessageReadState")
+
+    for state in MessageReadState.objects.all().iterator():
+        Message.objects.filter(
+            receiver_id=state.user_id,
+            move_info_id=state.move_info_id,
+            created_at__lte=state.last_read_at,
+        ).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_outboxemail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageReadState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_read_at", models.DateTimeField()),
+                ("move_info", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="message_read_states", to="app.moveinfo")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="message_read_states", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("user", "move_info"), name="unique_message_read_state")],
+            },
+        ),
+        migrations.RunPython(is_read_to_watermark, watermark_to_is_read),
+        migrations.RemoveIndex(
+            model_name="message",
+            name="message_unread_idx",
+        ),
+        migrations.RemoveField(
+            model_name="message",
+            name="is_read",
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["receiver", "move_info", "created_at"], name="message_inbox_idx"),
+        ),
+    ]
@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """世帯のデータの外部キーから DB の制約を外す（シャードとカタログをまたぐため。app/shards.py）"""
+
+    dependencies = [
+        ("app", "0010_message_read_watermark"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="invite",
+            name="move_info",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="invites", to="app.moveinfo"),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="move_info",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="messages", to="app.moveinfo"),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="receiver",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="received_messages", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="sender",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="sent_messages", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name="messagereadstate",
+            name="move_info",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="message_read_states", to="app.moveinfo"),
+        ),
+        migrations.AlterField(
+            model_name="messagereadstate",
+            name="user",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="message_read_states", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name="task",
+            name="created_by",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="created_tasks", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name="task",
+            name="move_info",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="tasks", to="app.moveinfo"),
+        ),
+    ]
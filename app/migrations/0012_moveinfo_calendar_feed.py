@@ -0,0 +1,23 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """カレンダー購読（ICS）のトークンと、タスクの最終更新時刻（app/ics.py）"""
+
+    dependencies = [
+        ("app", "0011_household_fk_without_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moveinfo",
+            name="calendar_token",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="moveinfo",
+            name="tasks_updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
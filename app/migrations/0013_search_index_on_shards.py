@@ -0,0 +1,57 @@
+from django.db import migrations
+
+CREATE_SEARCH_INDEX = """
+CREATE VIRTUAL TABLE app_search_index USING fts5(
+    title,
+    body,
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    move_info_id UNINDEXED,
+    tokenize = 'trigram'
+)
+"""
+
+# rowid はメッセージ = id * 2、タスク = id * 2 + 1（app/search.py と合わせる）
+FILL_MESSAGES = """
+INSERT INTO app_search_index (rowid, kind, object_id, move_info_id, title, body)
+SELECT m.id * 2, 'message', m.id, m.move_info_id,
+       COALESCE(s.full_name, '') || ' ' || COALESCE(r.full_name, ''), m.content
+FROM app_message m
+INNER JOIN app_customuser s ON s.id = m.sender_id
+INNER JOIN app_customuser r ON r.id = m.receiver_id
+"""
+
+FILL_TASKS = """
+INSERT INTO app_search_index (rowid, kind, object_id, move_info_id, title, body)
+SELECT t.id * 2 + 1, 'task', t.id, t.move_info_id,
+       TRIM(t.task_name || ' ' || COALESCE(t.custom_task, '')), t.memo
+FROM app_task t
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """全文検索の索引が無い DB（シャード）に作って既存データを入れる（SQLite のみ）
+    0008 はヒントが無いのでシャードでは実行されない（app/shards.py のルーター）
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'app_search_index'")
+        if cursor.fetchone():
+            return
+    schema_editor.execute(CREATE_SEARCH_INDEX)
+    schema_editor.execute(FILL_MESSAGES)
+    schema_editor.execute(FILL_TASKS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0012_moveinfo_calendar_feed"),
+    ]
+
+    operations = [
+        # シャードでも実行させる（世帯のテーブルと同じ扱い）
+        migrations.RunPython(create_search_index, migrations.RunPython.noop, hints={"model_name": "task"}),
+    ]
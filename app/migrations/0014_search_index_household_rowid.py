@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# rowid の上位ビットに世帯の id を入れる（app/search.py の HOUSEHOLD_SHIFT と合わせる）
+HOUSEHOLD_SHIFT = 32
+
+HAS_SEARCH_INDEX = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'app_search_index'"
+
+
+def _renumber(schema_editor, sql):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(HAS_SEARCH_INDEX)
+        if not cursor.fetchone():
+            return
+    schema_editor.execute(sql)
+
+
+def add_household_to_rowid(apps, schema_editor):
+    """rowid を (世帯の id << 32) | (id * 2 + 種類) にする（世帯ごとに rowid の範囲で検索できるように）"""
+    _renumber(
+        schema_editor,
+        f"UPDATE app_search_index SET rowid = (move_info_id << {HOUSEHOLD_SHIFT}) | rowid",
+    )
+
+
+def remove_household_from_rowid(apps, schema_editor):
+    _renumber(
+        schema_editor,
+        f"UPDATE app_search_index SET rowid = rowid & ((1 << {HOUSEHOLD_SHIFT}) - 1)",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_search_index_on_shards"),
+    ]
+
+    operations = [
+        # シャードでも実行させる（世帯のテーブルと同じ扱い）
+        migrations.RunPython(add_household_to_rowid, remove_household_from_rowid, hints={"model_name": "task"}),
+    ]
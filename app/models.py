@@ -1,11 +1,14 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager, User
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
 import uuid
 
+from .household_cache import invalidate_household
+
 
 # ==========================
 # Custom User Manager
@@ -63,6 +66,12 @@ class CustomUser(AbstractUser):
     
     objects = UserManager()
 
+    def get_session_auth_hash(self):
+        # キャッシュから読んだユーザー（password を持たない。app/auth_backends.py）は、置いておいた値を使う
+        if "password" not in self.__dict__ and "_session_auth_hash" in self.__dict__:
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
     def __str__(self):
         return self.full_name or self.email
 
@@ -70,6 +79,8 @@ class CustomUser(AbstractUser):
 # ==========================
 # 招待管理モデル
 # ==========================
+# 世帯のデータ（Invite / Message / MessageReadState / Task）はシャード（app/shards.py）に置くことがあるので、
+# カタログ（CustomUser / MoveInfo）への外部キーは DB の制約を張らない（CASCADE などは ORM が行う）
 class Invite(models.Model):
     """招待リンク管理モデル"""
     code = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
@@ -77,7 +88,8 @@ class Invite(models.Model):
     move_info = models.ForeignKey(
         "MoveInfo",
         on_delete=models.CASCADE,
-        related_name='invites'
+        related_name='invites',
+        db_constraint=False,
     )
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(blank=True, null=True)
@@ -104,12 +116,14 @@ class Message(models.Model):
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='sent_messages'
+        related_name='sent_messages',
+        db_constraint=False,
     )
     receiver = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='received_messages'
+        related_name='received_messages',
+        db_constraint=False,
     )
     content = models.TextField(max_length=500)
     created_at = models.DateTimeField(default=timezone.now)
@@ -117,13 +131,47 @@ class Message(models.Model):
     move_info = models.ForeignKey(
         'MoveInfo',
         on_delete=models.CASCADE,
-        related_name='messages'
+        related_name='messages',
+        db_constraint=False,
     )
     
-    is_read = models.BooleanField(default=False)
+    class Meta:
+        indexes = [
+            # 掲示板（MoveInfo ごとに新しい順）
+            models.Index(fields=["move_info", "created_at"], name="message_board_idx"),
+            # 未読件数（受信者・MoveInfo ごとに既読位置より新しいもの）
+            models.Index(fields=["receiver", "move_info", "created_at"], name="message_inbox_idx"),
+        ]
 
     def __str__(self):
         return f"{self.sender} → {self.receiver}: {self.content[:15]}"
+
+
+class MessageReadState(models.Model):
+    """掲示板の既読位置（ユーザー × MoveInfo ごと）
+    last_read_at より後に作成されたメッセージを未読とみなす
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='message_read_states',
+        db_constraint=False,
+    )
+    move_info = models.ForeignKey(
+        'MoveInfo',
+        on_delete=models.CASCADE,
+        related_name='message_read_states',
+        db_constraint=False,
+    )
+    last_read_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "move_info"], name="unique_message_read_state"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} (MoveInfo id={self.move_info_id}): {self.last_read_at}"
     
  
 # ==========================
@@ -157,7 +205,8 @@ class Task(models.Model):
     move_info = models.ForeignKey(
         'MoveInfo',
         on_delete=models.CASCADE,
-        related_name='tasks'
+        related_name='tasks',
+        db_constraint=False,
     )
     
     created_by = models.ForeignKey(
@@ -165,7 +214,8 @@ class Task(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name="created_tasks"
+        related_name="created_tasks",
+        db_constraint=False,
     )
     
     task_name = models.CharField(max_length=100, blank=True)
@@ -176,6 +226,14 @@ class Task(models.Model):
     memo = models.TextField(blank=True)
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # タスク一覧・カレンダー（MoveInfo ごとに日付・時刻順）
+            models.Index(fields=["move_info", "date", "start_time", "end_time"], name="task_schedule_idx"),
+            # 完了／未完での絞り込み・集計
+            models.Index(fields=["move_info", "is_completed"], name="task_completion_idx"),
+        ]
     
     def __str__(self):
         return self.custom_task or self.task_name
@@ -200,8 +258,96 @@ class MoveInfo(models.Model):
         related_name='updated_moveinfo'
     )
     updated_at = models.DateTimeField(auto_now=True)
+    
+    # タスク進捗のカウンタ（home 画面で毎回 COUNT しないための非正規化）
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+
+    # カレンダー購読（ICS）の URL に入れるトークン（発行するまでは None）
+    calendar_token = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # タスクを最後に追加・変更・削除した時刻（ICS の Last-Modified / ETag に使う）
+    tasks_updated_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def progress_rate(self):
+        """達成度（%）。タスクが1件もない場合は0%"""
+        if not self.total_tasks:
+            return 0
+        return int((self.completed_tasks / self.total_tasks) * 100)
+
+    def adjust_task_counters(self, total=0, completed=0):
+        """タスク進捗のカウンタを増減する（household_atomic の中で使う。書き込むのはシャードのコミット後）
+        タスクが変わった時刻も同じ UPDATE で記録する（touch_tasks と同じ。カタログへの書き込みを1回にするため、
+        呼び出し側は保存・削除する Task に _counters_adjusted を付けて signals の touch_tasks を飛ばす）
+        """
+        from .shards import after_household_commit
+
+        move_info_id = self.pk
+
+        def update():
+            MoveInfo.objects.filter(pk=move_info_id).update(
+                total_tasks=F('total_tasks') + total,
+                completed_tasks=F('completed_tasks') + completed,
+                tasks_updated_at=timezone.now(),
+            )
+            # update() では signals が飛ばないので、世帯キャッシュはここで無効にする
+            invalidate_household(move_info_id)
+
+        after_household_commit(move_info_id, update)
+
+    @classmethod
+    def touch_tasks(cls, move_info_id):
+        """タスクが変わった時刻を記録する（カレンダー購読の Last-Modified / ETag。書き込むのはシャードのコミット後）"""
+        from .shards import after_household_commit
+
+        after_household_commit(
+            move_info_id,
+            lambda: cls.objects.filter(pk=move_info_id).update(tasks_updated_at=timezone.now()),
+        )
 
     def __str__(self):
         owner_name = self.owner.full_name if self.owner else "未設定"
         date = self.move_date.strftime("%Y-%m-%d") if self.move_date else "未設定"
-        return f"[管理者: {owner_name}] 引越し日: {date}"
\ No newline at end of file
+        return f"[管理者: {owner_name}] 引越し日: {date}"
+    
+    
+# ==========================
+# メール送信の Outbox（送信はワーカーで行う）
+# ==========================
+class OutboxEmail(models.Model):
+    """送信待ちのメール（業務データと同じトランザクションで登録する）"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '送信待ち'),
+        (STATUS_SENDING, '送信中'),
+        (STATUS_SENT, '送信済み'),
+        (STATUS_DEAD, '送信失敗（再送しない）'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # 次に送信を試みる時刻（送信中はワーカーの持ち時間の期限）
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # 取り出したワーカーの識別子
+    locked_by = models.UUIDField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # ワーカーが送信対象を探す
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
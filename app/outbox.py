@@ -0,0 +1,182 @@
+# app/outbox.py
+"""
+メール送信の Outbox
+
+- view では enqueue_email() で OutboxEmail を登録するだけ（業務データと同じトランザクション）
+- 実際の送信は send_outbox コマンド（ワーカー）が process_batch() でまとめて行う
+- 一時的な失敗は指数バックオフで再送し、恒久的な失敗や上限回数に達したものは dead にする
+"""
+import random
+import smtplib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import BadHeaderError, EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .email_backend import SendGridAPIError
+from .models import OutboxEmail
+
+# 送信を試みる最大回数（これを超えたら dead）
+MAX_ATTEMPTS = 8
+# 再送間隔（秒）: BACKOFF_BASE * 2^(試行回数-1)、上限 BACKOFF_MAX
+BACKOFF_BASE = 30
+BACKOFF_MAX = 60 * 60
+# ワーカーが取り出したメールの持ち時間（これを過ぎたら他のワーカーが取り直せる）
+LEASE_SECONDS = 5 * 60
+
+
+class PermanentEmailError(Exception):
+    """再送しても成功しない失敗"""
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """送信するメールを Outbox に登録する（呼び出し側のトランザクション内で使う）"""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def _is_permanent(error):
+    """再送しても無駄な失敗か（宛先拒否・ヘッダ不正・SMTP の 5xx 応答・API の 4xx 応答など）"""
+    if isinstance(error, (PermanentEmailError, BadHeaderError, ValueError,
+                          smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    if isinstance(error, SendGridAPIError):
+        # 宛先・内容の不正（4xx）は何度送っても同じ。429（送りすぎ）と 5xx は時間をおいて再送する
+        return 400 <= error.status < 500 and error.status != 429
+    return False
+
+
+def backoff_delay(attempts):
+    """attempts 回目の失敗の後、次に送信するまでの秒数（ジッター付き）"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_batch(batch_size):
+    """送信対象を最大 batch_size 件取り出す（他のワーカーと重複しない）"""
+    now = timezone.now()
+    token = uuid.uuid4()
+    due = (
+        OutboxEmail.objects.filter(
+            # 送信待ち、または持ち時間切れの送信中（ワーカーが落ちた場合）
+            Q(status=OutboxEmail.STATUS_PENDING) | Q(status=OutboxEmail.STATUS_SENDING),
+            next_attempt_at__lte=now,
+        )
+        .order_by("next_attempt_at")
+        .values("pk")[:batch_size]
+    )
+    # 1回の UPDATE で取り出すので、同時に動くワーカーとも取り合いにならない
+    OutboxEmail.objects.filter(pk__in=due).update(
+        status=OutboxEmail.STATUS_SENDING,
+        locked_by=token,
+        next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+    )
+    return list(OutboxEmail.objects.filter(locked_by=token, status=OutboxEmail.STATUS_SENDING))
+
+
+def _mark_sent(email):
+    OutboxEmail.objects.filter(pk=email.pk, locked_by=email.locked_by).update(
+        status=OutboxEmail.STATUS_SENT,
+        attempts=email.attempts + 1,
+        sent_at=timezone.now(),
+        locked_by=None,
+        last_error="",
+    )
+
+
+def _mark_failed(email, error, max_attempts):
+    attempts = email.attempts + 1
+    if _is_permanent(error) or attempts >= max_attempts:
+        status = OutboxEmail.STATUS_DEAD
+        next_attempt_at = email.next_attempt_at
+    else:
+        status = OutboxEmail.STATUS_PENDING
+        next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(attempts))
+
+    OutboxEmail.objects.filter(pk=email.pk, locked_by=email.locked_by).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        locked_by=None,
+        last_error=f"{type(error).__name__}: {error}"[:2000],
+    )
+    return status
+
+
+def process_batch(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """Outbox からまとめて送信する（送信・再送予定・dead の件数を返す）"""
+    emails = claim_batch(batch_size)
+    result = {"sent": 0, "retry": 0, "dead": 0}
+    if not emails:
+        return result
+
+    # バッチ内は同じ接続を使い回す
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # 接続できない場合はバッチ全体を再送予定にする
+        for email in emails:
+            status = _mark_failed(email, e, max_attempts)
+            result["dead" if status == OutboxEmail.STATUS_DEAD else "retry"] += 1
+        return result
+
+    try:
+        messages = [
+            EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.to,
+                connection=connection,
+            )
+            for email in emails
+        ]
+        for email, error in zip(emails, _send_all(connection, messages)):
+            if error is None:
+                _mark_sent(email)
+                result["sent"] += 1
+            else:
+                status = _mark_failed(email, error, max_attempts)
+                result["dead" if status == OutboxEmail.STATUS_DEAD else "retry"] += 1
+    finally:
+        connection.close()
+
+    return result
+
+
+def _send_all(connection, messages):
+    """メールを送って、1通ごとのエラー（成功なら None）を返す"""
+    # 1通ごとの結果を返すバックエンド（SendGrid）はバッチごとまとめて送る
+    if hasattr(connection, "results"):
+        connection.fail_silently = True
+        connection.send_messages(messages)
+        results = {id(r.message): r for r in connection.results}
+        errors = []
+        for message in messages:
+            r = results.get(id(message))
+            if r is None:
+                errors.append(PermanentEmailError("宛先がありません"))
+            else:
+                errors.append(None if r.sent else r.error)
+        return errors
+
+    errors = []
+    for message in messages:
+        try:
+            if not message.send(fail_silently=False):
+                raise PermanentEmailError("宛先がありません")
+        except Exception as e:
+            errors.append(e)
+        else:
+            errors.append(None)
+    return errors
@@ -0,0 +1,170 @@
+# app/page_cache.py
+"""
+読み込みページの stale-while-revalidate（DB がロックされている・遅すぎるときは前回の表示を返す）
+
+- @stale_while_revalidate("home") を付けた view は、最後に正常に描画した HTML を
+  （ユーザー・ページ・URL・CSRF の秘密ごとに）キャッシュに残しておく
+- 描画はリクエストのスレッドでその場で行い、描画中の SQL に RENDER_BUDGET 秒の上限をかける
+  （hikkoshigoproject/sqlite_backend の time_budget。ロック待ちも実行中の文も打ち切る）
+  - SQLite のロック（database is locked）か上限切れ（interrupted）で失敗したら前回の HTML を返し、
+    別スレッドで描画し直してキャッシュを更新する（同じページは同時に1つだけ）
+  - 前回の HTML が無いとき（初回・キャッシュ切れ）は上限をかけずに描画し直す
+  - それ以外のエラーはそのまま上げる
+- 前回の HTML を返したときは Age と X-Stale（locked / timeout）のヘッダーを付ける
+- 保存は世帯のバージョンが変わったとき（app/household_cache.py）か STORE_INTERVAL 秒ごとだけ
+  （フラッシュメッセージを表示したページは一度きりの内容なので保存しない）
+"""
+import copy
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.contrib.messages.storage import default_storage
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections
+from django.http import HttpResponse
+
+from hikkoshigoproject.sqlite_backend.base import time_budget
+
+from .household_cache import get_version
+
+# 描画中の SQL にかける時間の上限（秒）。超えたら前回の HTML を返す
+RENDER_BUDGET = 1.0
+
+# 前回の HTML の保存期間（秒）。DB が使えない間の予備なので長めに残す
+STALE_TIMEOUT = 60 * 60 * 24
+
+# 世帯のデータが変わっていなくても保存し直す間隔（秒）。未読件数などの表示を追いかける
+STORE_INTERVAL = 60
+
+# 前回の HTML を返したあとの描画し直し（待ち時間（秒）と回数）
+REFRESH_DELAY = 1.0
+REFRESH_ATTEMPTS = 3
+
+# 描画し直しを1つにまとめるロックの有効期限（秒）
+REFRESH_LOCK_TIMEOUT = 30
+
+# 描画し直しに使うスレッドの数（ワーカーごと）
+REFRESH_THREADS = 4
+
+# 保存した時刻を覚えておくページの上限（ワーカーごと。超えたら忘れて保存し直す）
+MAX_REMEMBERED = 10000
+
+_executor = ThreadPoolExecutor(max_workers=REFRESH_THREADS, thread_name_prefix="page-refresh")
+
+# キー → (世帯のバージョン, 保存した時刻)。ワーカーごとに、保存し直すかどうかの判断に使う
+_stored = {}
+_stored_lock = threading.Lock()
+
+
+def _page_key(request, page):
+    """HTML には CSRF トークンが入るので、CSRF の秘密（Cookie）が変わったら別のキーにする"""
+    source = f"{request.get_full_path()}\n{request.META.get('CSRF_COOKIE', '')}"
+    digest = hashlib.md5(source.encode()).hexdigest()
+    return f"stale_page:{request.user.pk}:{page}:{digest}"
+
+
+def _stale_reason(exc):
+    """前回の HTML を返してよいエラーなら理由を返す"""
+    message = str(exc).lower()
+    if "locked" in message or "busy" in message:
+        return "locked"
+    if "interrupted" in message:
+        return "timeout"
+    return None
+
+
+def _has_messages(request):
+    """フラッシュメッセージを表示した（または表示待ちがある）か"""
+    storage = getattr(request, "_messages", None)
+    return storage is not None and (storage.used or len(storage) > 0)
+
+
+def _store(key, request, response, force=False):
+    """正常に描画できた HTML を保存する（force でなければ、変わっていなさそうなときは書き込まない）"""
+    if response.status_code != 200 or response.streaming or _has_messages(request):
+        return
+    version = get_version(request.user.move_info_id) if request.user.move_info_id else None
+    now = time.monotonic()
+    with _stored_lock:
+        previous = _stored.get(key)
+        if not force and previous and previous[0] == version and now - previous[1] < STORE_INTERVAL:
+            return
+        if len(_stored) >= MAX_REMEMBERED:
+            _stored.clear()
+        _stored[key] = (version, now)
+    cache.set(key, (response.content, response["Content-Type"], time.time()), STALE_TIMEOUT)
+
+
+def _refresh_later(key, view, request, args, kwargs):
+    """前回の HTML を返したあと、別スレッドで上限をかけずに描画し直して保存する（同じページは1つだけ）"""
+    lock_key = f"{key}:refresh"
+    if not cache.add(lock_key, 1, REFRESH_LOCK_TIMEOUT):
+        return
+    # 元のリクエストのフラッシュメッセージと CSRF の状態には触らない
+    background = copy.copy(request)
+    background.META = request.META.copy()
+    background._messages = default_storage(background)
+
+    def refresh():
+        try:
+            for attempt in range(REFRESH_ATTEMPTS):
+                time.sleep(REFRESH_DELAY * attempt)
+                try:
+                    response = view(background, *args, **kwargs)
+                except OperationalError as exc:
+                    if _stale_reason(exc) is None:
+                        return
+                    continue
+                _store(key, background, response, force=True)
+                return
+        finally:
+            close_old_connections()
+            cache.delete(lock_key)
+
+    _executor.submit(refresh)
+
+
+def _stale_response(stale, reason):
+    content, content_type, stored_at = stale
+    response = HttpResponse(content, content_type=content_type)
+    response["Age"] = str(max(0, int(time.time() - stored_at)))
+    response["X-Stale"] = reason
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def stale_while_revalidate(page):
+    """DB がロックされている・遅すぎるときに前回の HTML を返して描画し直す（GET とログイン済みのみ）"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            key = _page_key(request, page)
+            try:
+                with time_budget(RENDER_BUDGET):
+                    response = view(request, *args, **kwargs)
+            except OperationalError as exc:
+                reason = _stale_reason(exc)
+                if reason is None:
+                    raise
+                # 途中まで読んだフラッシュメッセージは次のページで表示する
+                storage = getattr(request, "_messages", None)
+                if storage is not None:
+                    storage.used = False
+                stale = cache.get(key)
+                if stale is not None:
+                    _refresh_later(key, view, request, args, kwargs)
+                    return _stale_response(stale, reason)
+                # 返せるものが無いので、上限をかけずに描画し直す
+                response = view(request, *args, **kwargs)
+
+            # 描画中に CSRF の秘密が作られたら、そちらのキーに保存する
+            _store(_page_key(request, page), request, response)
+            return response
+        return wrapper
+    return decorator
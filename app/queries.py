@@ -0,0 +1,110 @@
+# app/queries.py
+"""
+よく呼ばれる（ホットな）クエリの組み立て
+views とクエリプランのチェック（app/checks.py）で同じ形のクエリを使う
+世帯のデータは MoveInfo のシャード（app/shards.py）から読む
+"""
+from datetime import datetime, timezone
+
+from django.db.models import DateTimeField, F, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Message, MessageReadState, Task
+from .shards import for_household
+
+# 既読位置が無い場合の既読位置（これより後はすべて未読）
+NEVER_READ = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# カレンダー／日別モーダルで使うタスクの列
+CALENDAR_TASK_FIELDS = ('id', 'date', 'task_name', 'custom_task', 'start_time', 'end_time', 'memo')
+
+# カレンダー購読（ICS）で使うタスクの列
+CALENDAR_FEED_FIELDS = CALENDAR_TASK_FIELDS + ('is_completed',)
+
+
+def _move_info_id(move_info):
+    """MoveInfo でも id でも受け付ける"""
+    return getattr(move_info, "pk", move_info)
+
+
+def task_list_rows(move_info):
+    """タスク一覧（日付順）"""
+    return for_household(Task, _move_info_id(move_info)).filter(move_info=move_info).order_by("date")
+
+
+def calendar_task_rows(move_info, start, end):
+    """カレンダーの表示範囲（start〜end）のタスク"""
+    return (
+        for_household(Task, _move_info_id(move_info)).filter(move_info=move_info, date__range=(start, end))
+        .order_by('date', 'start_time', 'end_time', 'id')
+        .values(*CALENDAR_TASK_FIELDS)
+    )
+
+
+def calendar_feed_rows(move_info):
+    """カレンダー購読（ICS）の全タスク（日付・時刻順）"""
+    return (
+        for_household(Task, _move_info_id(move_info)).filter(move_info=move_info)
+        .order_by('date', 'start_time', 'end_time', 'id')
+        .values(*CALENDAR_FEED_FIELDS)
+    )
+
+
+def day_task_rows(move_info, day):
+    """指定日のタスク（時刻順）"""
+    return (
+        for_household(Task, _move_info_id(move_info)).filter(move_info=move_info, date=day)
+        .order_by('start_time', 'end_time', 'id')
+        .values(*CALENDAR_TASK_FIELDS)
+    )
+
+
+def message_board_rows(move_info, query=None, cursor=None):
+    """掲示板のメッセージ（新しい順）
+    - 送信者・受信者の名前は同じクエリで JOIN して取得（N+1 を防ぐ）
+    - 表示に使う列だけを SELECT する
+    - cursor=(created_at, id) より古いものだけに絞る
+    """
+    rows = (
+        for_household(Message, _move_info_id(move_info)).filter(move_info=move_info)
+        .order_by("-created_at", "-id")
+        .values(
+            "id",
+            "content",
+            "created_at",
+            sender_name=F("sender__full_name"),
+            receiver_name=F("receiver__full_name"),
+        )
+    )
+
+    # キーワードが入力された場合のみフィルタ
+    if query:
+        rows = rows.filter(
+            Q(content__icontains=query) |
+            Q(sender__full_name__icontains=query) |
+            Q(receiver__full_name__icontains=query)
+        )
+
+    if cursor:
+        created_at, message_id = cursor
+        # created_at <= カーソル でインデックスの途中から読み始められるようにする
+        rows = rows.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=message_id)
+        )
+
+    return rows
+
+
+def unread_messages(user_id, move_info_id):
+    """ユーザー宛ての未読メッセージ（MoveInfo の既読位置より後に作成されたもの）"""
+    last_read_at = (
+        MessageReadState.objects.filter(user=user_id, move_info=move_info_id)
+        .values("last_read_at")[:1]
+    )
+    return for_household(Message, move_info_id).filter(
+        receiver=user_id,
+        move_info=move_info_id,
+        # 既読位置が無い（一度も掲示板を開いていない）場合はすべて未読
+        created_at__gt=Coalesce(Subquery(last_read_at), Value(NEVER_READ, output_field=DateTimeField())),
+    )
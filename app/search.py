@@ -0,0 +1,229 @@
+# app/search.py
+"""
+メッセージ・タスクの全文検索（SQLite FTS5）
+
+- 索引テーブル app_search_index は 0008 のマイグレーションで作成する
+- trigram トークナイザなので日本語も部分一致で検索できる（3文字以上）
+- 保存・削除はシグナル（app/signals.py）で索引に反映する
+- rowid の上位ビットを世帯（MoveInfo）の id にして、検索は世帯の rowid の範囲だけを見る
+  （FTS5 は rowid の範囲の外の doclist を読まないので、ほかの世帯のデータ量に左右されない）
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Message, Task
+from .shards import db_for_household
+
+SEARCH_TABLE = "app_search_index"
+
+# rowid = (世帯の id << HOUSEHOLD_SHIFT) | (メッセージ = id * 2、タスク = id * 2 + 1)
+# 索引の更新は rowid で行う（0014 のマイグレーションと合わせる）
+KIND_MESSAGE = "message"
+KIND_TASK = "task"
+HOUSEHOLD_SHIFT = 32
+
+# trigram で MATCH できる最短の文字数（これより短い語は LIKE で探す）
+MIN_MATCH_LENGTH = 3
+
+
+def _rowid(kind, object_id, move_info_id):
+    return (move_info_id << HOUSEHOLD_SHIFT) | (object_id * 2 + (1 if kind == KIND_TASK else 0))
+
+
+def _household_range(move_info_id):
+    """世帯の rowid の範囲（両端を含む）"""
+    return move_info_id << HOUSEHOLD_SHIFT, ((move_info_id + 1) << HOUSEHOLD_SHIFT) - 1
+
+
+# SQL の中で行から rowid を求める式（短い語の検索で、世帯の行から索引を引くため）
+MESSAGE_ROWID_SQL = f"((m.move_info_id << {HOUSEHOLD_SHIFT}) | (m.id * 2))"
+TASK_ROWID_SQL = f"((t.move_info_id << {HOUSEHOLD_SHIFT}) | (t.id * 2 + 1))"
+
+
+# 索引テーブルがあると確認できた DB エイリアス（毎回テーブル一覧を引かないため）
+_available_aliases = set()
+
+
+def is_available(using="default"):
+    """全文検索が使えるか（SQLite で索引テーブルがある場合のみ）"""
+    if using in _available_aliases:
+        return True
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+    if SEARCH_TABLE in connection.introspection.table_names():
+        _available_aliases.add(using)
+        return True
+    return False
+
+
+def _message_document(message):
+    """メッセージの索引内容（title=送信者・受信者の名前, body=本文）"""
+    names = [message.sender.full_name or "", message.receiver.full_name or ""]
+    return " ".join(names), message.content
+
+
+def _task_document(task):
+    """タスクの索引内容（title=タスク名, body=メモ）"""
+    return " ".join(filter(None, [task.task_name, task.custom_task])), task.memo or ""
+
+
+def _write(using, kind, object_id, move_info_id, title, body):
+    rowid = _rowid(kind, object_id, move_info_id)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, move_info_id, title, body) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [rowid, kind, object_id, move_info_id, title, body],
+        )
+
+
+def index_message(message):
+    using = message._state.db or router.db_for_write(Message, instance=message)
+    if not is_available(using):
+        return
+    _write(using, KIND_MESSAGE, message.pk, message.move_info_id, *_message_document(message))
+
+
+def index_task(task):
+    using = task._state.db or router.db_for_write(Task, instance=task)
+    if not is_available(using):
+        return
+    _write(using, KIND_TASK, task.pk, task.move_info_id, *_task_document(task))
+
+
+def remove(kind, object_id, move_info_id, using="default"):
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [_rowid(kind, object_id, move_info_id)])
+
+
+def remove_household(move_info_id, using="default"):
+    """世帯の索引をまとめて消す（シャード間の移動・世帯の削除のとき）"""
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid BETWEEN %s AND %s", _household_range(move_info_id))
+
+
+def reindex_user_messages(user, using="default"):
+    """名前が変わったユーザーの送受信メッセージを索引し直す"""
+    if not is_available(using):
+        return
+    messages = (
+        Message.objects.using(using)
+        .filter(Q(sender=user) | Q(receiver=user))
+        .select_related("sender", "receiver")
+    )
+    for message in messages.iterator(chunk_size=500):
+        index_message(message)
+
+
+def rebuild(using="default", batch_size=500):
+    """索引を作り直す（件数を (メッセージ数, タスク数) で返す）"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    message_count = 0
+    for message in (
+        Message.objects.using(using)
+        .select_related("sender", "receiver")
+        .only("id", "content", "move_info_id", "sender__full_name", "receiver__full_name")
+        .iterator(chunk_size=batch_size)
+    ):
+        _write(using, KIND_MESSAGE, message.pk, message.move_info_id, *_message_document(message))
+        message_count += 1
+
+    task_count = 0
+    for task in (
+        Task.objects.using(using)
+        .only("id", "task_name", "custom_task", "memo", "move_info_id")
+        .iterator(chunk_size=batch_size)
+    ):
+        _write(using, KIND_TASK, task.pk, task.move_info_id, *_task_document(task))
+        task_count += 1
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+    return message_count, task_count
+
+
+def _match_phrase(query):
+    """3文字以上の検索語 → FTS5 のフレーズ検索（bm25 で順位付け）"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _like_pattern(query):
+    """3文字未満の検索語 → trigram では引けないので LIKE で部分一致"""
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_messages(move_info, query, limit, offset=0, using=None):
+    """MoveInfo 内のメッセージを検索する（順位順、1回のクエリで名前まで取得）
+    掲示板と同じ形の辞書（id, content, created_at, sender_name, receiver_name）のリストを返す
+    """
+    using = using or db_for_household(move_info.pk)
+    columns = (
+        "SELECT m.id, m.content, m.created_at, "
+        "s.full_name AS sender_name, r.full_name AS receiver_name "
+    )
+    names = (
+        "INNER JOIN app_customuser s ON s.id = m.sender_id "
+        "INNER JOIN app_customuser r ON r.id = m.receiver_id "
+    )
+    if len(query) >= MIN_MATCH_LENGTH:
+        sql = (
+            columns + f"FROM {SEARCH_TABLE} f "
+            "INNER JOIN app_message m ON m.id = f.object_id " + names +
+            f"WHERE {SEARCH_TABLE} MATCH %s AND f.rowid BETWEEN %s AND %s AND f.kind = %s "
+            "ORDER BY f.rank, m.created_at DESC LIMIT %s OFFSET %s"
+        )
+        params = [_match_phrase(query), *_household_range(move_info.pk), KIND_MESSAGE]
+    else:
+        # 世帯のメッセージ（message_board_idx）から rowid で索引の行を引く（CROSS JOIN で結合順を固定）
+        pattern = _like_pattern(query)
+        sql = (
+            columns + f"FROM app_message m CROSS JOIN {SEARCH_TABLE} f " + names +
+            f"WHERE m.move_info_id = %s AND f.rowid = {MESSAGE_ROWID_SQL} "
+            "AND (f.title LIKE %s ESCAPE '\\' OR f.body LIKE %s ESCAPE '\\') "
+            "ORDER BY m.created_at DESC, m.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [move_info.pk, pattern, pattern]
+    rows = Message.objects.using(using).raw(sql, params + [limit, offset])
+    return [
+        {
+            "id": m.id,
+            "content": m.content,
+            "created_at": m.created_at,
+            "sender_name": m.sender_name,
+            "receiver_name": m.receiver_name,
+        }
+        for m in rows
+    ]
+
+
+def search_tasks(move_info, query, limit, offset=0, using=None):
+    """MoveInfo 内のタスクを検索する（順位順の Task のリスト）"""
+    using = using or db_for_household(move_info.pk)
+    if len(query) >= MIN_MATCH_LENGTH:
+        sql = (
+            f"SELECT t.* FROM {SEARCH_TABLE} f "
+            "INNER JOIN app_task t ON t.id = f.object_id "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND f.rowid BETWEEN %s AND %s AND f.kind = %s "
+            "ORDER BY f.rank, t.date LIMIT %s OFFSET %s"
+        )
+        params = [_match_phrase(query), *_household_range(move_info.pk), KIND_TASK]
+    else:
+        # 世帯のタスク（task_schedule_idx）から rowid で索引の行を引く（CROSS JOIN で結合順を固定）
+        pattern = _like_pattern(query)
+        sql = (
+            f"SELECT t.* FROM app_task t CROSS JOIN {SEARCH_TABLE} f "
+            f"WHERE t.move_info_id = %s AND f.rowid = {TASK_ROWID_SQL} "
+            "AND (f.title LIKE %s ESCAPE '\\' OR f.body LIKE %s ESCAPE '\\') "
+            "ORDER BY t.date, t.id LIMIT %s OFFSET %s"
+        )
+        params = [move_info.pk, pattern, pattern]
+    return list(Task.objects.using(using).raw(sql, params + [limit, offset]))
@@ -0,0 +1,217 @@
+# app/shards.py
+"""
+世帯（MoveInfo）単位のシャーディング（settings.DATABASE_SHARDS 個の SQLite に分ける）
+
+- Task / Message / Invite / MessageReadState は MoveInfo の id % DATABASE_SHARDS 番目のシャードに置く
+  （SQLite の書き込みロックはファイルごとなので、別の世帯の書き込みが待たされなくなる）
+- CustomUser / MoveInfo などはカタログ（default）に置く。シャードの接続はカタログを読み取り専用で
+  ATTACH するので、メッセージと送信者の名前の JOIN はそのまま使える
+- ルーターは instance のヒントからしかシャードを決められないので、
+  世帯のデータを引く・objects.create() で作るときは for_household(Model, move_info_id) で DB を指定する
+  （指定し忘れると、カタログの空のテーブルを黙って読まないよう HouseholdNotSpecified を上げる）
+- 世帯のデータを書き込むトランザクションはシャードだけで張り、カタログ（MoveInfo のカウンタなど）への
+  書き込みはコミットの後に行う（after_household_commit）。シャードへの書き込みの間、
+  カタログの書き込みロックを取らないので、別の世帯の書き込みを待たせない
+- DATABASE_SHARDS が 0（デフォルト）なら何もしない（すべて default）
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import Invite, Message, MessageReadState, MoveInfo, Task
+
+# シャードに置くモデル（app の model_name）
+SHARDED_MODELS = {"task", "message", "invite", "messagereadstate"}
+
+# シャードの DB エイリアス（settings の DATABASES と合わせる）
+SHARD_ALIAS = "shard_{}"
+
+
+class HouseholdNotSpecified(RuntimeError):
+    """シャーディング中に、どの世帯か分からないまま世帯のデータを読み書きしようとした"""
+
+
+def shard_count():
+    return getattr(settings, "DATABASE_SHARDS", 0)
+
+
+def is_enabled():
+    return shard_count() > 0
+
+
+def shard_aliases():
+    """settings にあるシャードの DB エイリアス（移動元の古いシャードも含む）"""
+    return [alias for alias in settings.DATABASES if alias.startswith(SHARD_ALIAS.format(""))]
+
+
+def household_aliases():
+    """世帯のデータが入っている DB エイリアス"""
+    if not is_enabled():
+        return [DEFAULT_DB_ALIAS]
+    return [SHARD_ALIAS.format(index) for index in range(shard_count())]
+
+
+def db_for_household(move_info_id, shards=None):
+    """MoveInfo のデータを置く DB エイリアス（shards を省略すると settings のシャード数で決める）"""
+    shards = shard_count() if shards is None else shards
+    if not shards or move_info_id is None:
+        return DEFAULT_DB_ALIAS
+    return SHARD_ALIAS.format(move_info_id % shards)
+
+
+def for_household(model, move_info_id):
+    """世帯のデータの QuerySet（例: for_household(Task, user.move_info_id).filter(...)）"""
+    return model.objects.using(db_for_household(move_info_id))
+
+
+@contextmanager
+def household_atomic(move_info_id):
+    """世帯の DB でトランザクションを張る（カタログへの書き込みは after_household_commit で）"""
+    with transaction.atomic(using=db_for_household(move_info_id)):
+        yield
+
+
+def after_household_commit(move_info_id, func):
+    """カタログへの書き込みを、世帯のシャードのトランザクションがコミットしてから行う
+    - シャーディングしていなければ（同じ DB なので）その場で行い、同じトランザクションに入れる
+    - 2つのファイルをまたいだ原子性は無い。カウンタのズレは recount_task_progress で直す
+    """
+    alias = db_for_household(move_info_id)
+    if alias == DEFAULT_DB_ALIAS:
+        func()
+    else:
+        transaction.on_commit(func, using=alias)
+
+
+def find_invite(code):
+    """招待コードから Invite を探す（コードからは世帯が分からないので全シャードを見る）"""
+    for alias in household_aliases():
+        invites = Invite.objects.using(alias)
+        if alias == DEFAULT_DB_ALIAS:
+            invites = invites.select_related("move_info")
+        invite = invites.filter(code=code).first()
+        if invite is not None:
+            return invite
+    raise Invite.DoesNotExist
+
+
+def _household_tables():
+    return [Task._meta.db_table, Message._meta.db_table, Invite._meta.db_table, MessageReadState._meta.db_table]
+
+
+def delete_household_rows(move_info_id):
+    """削除した MoveInfo のシャード上のデータを消す（カタログの CASCADE はシャードまで届かない）"""
+    from . import search
+
+    alias = db_for_household(move_info_id)
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        for table in _household_tables():
+            cursor.execute(f"DELETE FROM {table} WHERE move_info_id = %s", [move_info_id])
+        search.remove_household(move_info_id, alias)
+
+
+def delete_user_rows(user_id):
+    """削除したユーザーのシャード上のデータを、カタログの on_delete と同じように片付ける"""
+    if not is_enabled():
+        return
+    for alias in household_aliases():
+        with transaction.atomic(using=alias):
+            Task.objects.using(alias).filter(created_by=user_id).update(created_by=None)
+            # メッセージの削除はシグナル（未読件数・索引・リアルタイム更新）も通す
+            Message.objects.using(alias).filter(sender=user_id).delete()
+            Message.objects.using(alias).filter(receiver=user_id).delete()
+            MessageReadState.objects.using(alias).filter(user=user_id).delete()
+
+
+def move_household(move_info_id, source, target):
+    """世帯のデータを source から target の DB に移す（件数の辞書を返す。移すものが無ければ None）
+    - 先に target に写してコミットし、そのあと source から消す（途中で止まってもやり直せる）
+    - 行の id は移動先で振り直す（シャードごとに id が別々のため）
+    """
+    from . import search
+
+    models = (Task, Message, Invite, MessageReadState)
+    if not any(model.objects.using(source).filter(move_info_id=move_info_id).exists() for model in models):
+        # 移し終わっている（source に何も無い）ときは target を消さない
+        return None
+
+    counts = {}
+    with transaction.atomic(using=target):
+        # 前回途中で止まったときの写しを消してから写す
+        with connections[target].cursor() as cursor:
+            for table in _household_tables():
+                cursor.execute(f"DELETE FROM {table} WHERE move_info_id = %s", [move_info_id])
+        search.remove_household(move_info_id, target)
+
+        for model in models:
+            rows = model.objects.using(source).filter(move_info_id=move_info_id).order_by("pk")
+            if model is Message:
+                # 索引に送信者・受信者の名前を入れるので一緒に読む（シャードでも ATTACH したカタログと JOIN できる）
+                rows = rows.select_related("sender", "receiver")
+            rows = list(rows)
+            for row in rows:
+                row.pk = None
+                row._state.adding = True
+            model.objects.using(target).bulk_create(rows)
+            counts[model._meta.model_name] = len(rows)
+            for row in rows:
+                if model is Task:
+                    search.index_task(row)
+                elif model is Message:
+                    search.index_message(row)
+
+    with transaction.atomic(using=source), connections[source].cursor() as cursor:
+        for table in _household_tables():
+            cursor.execute(f"DELETE FROM {table} WHERE move_info_id = %s", [move_info_id])
+        search.remove_household(move_info_id, source)
+    # id が振り直されて購読側の予定の UID が変わるので、カレンダー購読の ETag も変える
+    MoveInfo.touch_tasks(move_info_id)
+    return counts
+
+
+class HouseholdShardRouter:
+    """世帯のデータをシャードに、それ以外をカタログ（default）に振り分ける"""
+
+    def _is_sharded(self, model):
+        return model._meta.app_label == "app" and model._meta.model_name in SHARDED_MODELS
+
+    def db_for_read(self, model, **hints):
+        if not is_enabled():
+            return None
+        if not self._is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is None:
+            if model.__module__ == "__fake__":
+                # マイグレーション（RunPython）の履歴モデルは、カタログの空のテーブルを使う
+                return None
+            raise HouseholdNotSpecified(
+                f"{model._meta.label} の DB が分かりません（for_household() か using() で指定してください）"
+            )
+        if self._is_sharded(instance.__class__) and not instance._state.adding and instance._state.db:
+            # 読み込んだ行は読んだ DB に書き戻す（新しい行の _state.db は外部キーを代入したときに
+            # 相手の DB（default）になっていることがあるので、move_info_id で決める）
+            return instance._state.db
+        move_info_id = instance.pk if isinstance(instance, MoveInfo) else getattr(instance, "move_info_id", None)
+        return db_for_household(move_info_id) if move_info_id is not None else None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # カタログとシャードをまたぐ外部キー（db_constraint=False）を許可する
+        return True if is_enabled() else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not shard_aliases():
+            return None
+        if db == DEFAULT_DB_ALIAS:
+            # カタログにも世帯のテーブルを（空のまま）作る。Django の CASCADE の収集がそのまま動くように
+            return True
+        if db not in shard_aliases():
+            return None
+        # ヒントの無い RunPython / RunSQL はカタログのデータを扱うのでシャードでは実行しない
+        # （シャードで必要なものは hints={"model_name": ...} を付ける。0013_search_index_on_shards）
+        return app_label == "app" and model_name in SHARDED_MODELS
@@ -0,0 +1,181 @@
+# app/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import events, search, shards
+from .auth_backends import forget_user
+from .household_cache import invalidate_household
+from .models import CustomUser, Message, MoveInfo, Task
+from .unread import increment_unread_count, reset_unread_count
+
+
+# ==========================
+# 未読件数キャッシュの更新（ロールバックされた変更を数えないよう、コミット後に行う）
+# ==========================
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, using, **kwargs):
+    # 新しいメッセージは受信者の既読位置より後なので必ず未読
+    if created:
+        receiver_id = instance.receiver_id
+        transaction.on_commit(lambda: increment_unread_count(receiver_id), using=using)
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, using, **kwargs):
+    # 未読だったかは既読位置と比べないと分からないので数え直させる
+    receiver_id = instance.receiver_id
+    transaction.on_commit(lambda: reset_unread_count(receiver_id), using=using)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, using, update_fields=None, **kwargs):
+    # 参加する MoveInfo が変わると未読の対象も変わる
+    if update_fields is None or "move_info" in update_fields:
+        user_id = instance.pk
+        transaction.on_commit(lambda: reset_unread_count(user_id), using=using)
+
+
+# ==========================
+# 全文検索の索引の更新
+# ==========================
+@receiver(post_save, sender=Message)
+def index_message(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def unindex_message(sender, instance, using, **kwargs):
+    search.remove(search.KIND_MESSAGE, instance.pk, instance.move_info_id, using)
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_task(instance)
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, using, **kwargs):
+    search.remove(search.KIND_TASK, instance.pk, instance.move_info_id, using)
+
+
+# ==========================
+# カレンダー購読（ICS）の更新時刻（app/ics.py）
+# ==========================
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def touch_household_tasks(sender, instance, raw=False, **kwargs):
+    # カウンタも動かす保存・削除（views）は、adjust_task_counters が同じ UPDATE で記録する
+    if not raw and not getattr(instance, "_counters_adjusted", False):
+        MoveInfo.touch_tasks(instance.move_info_id)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_values(sender, instance, update_fields=None, raw=False, **kwargs):
+    """保存前の名前・MoveInfo を確認しておく
+    （メッセージの索引に名前が入っているため／抜けた世帯のキャッシュも無効にするため）
+    """
+    instance._full_name_changed = False
+    instance._previous_move_info_id = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {"full_name", "move_info"} & set(update_fields):
+        return
+    previous = (
+        CustomUser.objects.filter(pk=instance.pk)
+        .values("full_name", "move_info_id")
+        .first()
+    )
+    if previous is None:
+        return
+    instance._full_name_changed = previous["full_name"] != instance.full_name
+    instance._previous_move_info_id = previous["move_info_id"]
+
+
+@receiver(post_save, sender=CustomUser)
+def reindex_user_messages(sender, instance, using, **kwargs):
+    if getattr(instance, "_full_name_changed", False):
+        # メッセージは世帯のシャードにある（どの世帯に送ったかは分からないので全部見る）
+        for alias in shards.household_aliases():
+            search.reindex_user_messages(instance, alias)
+
+
+# ==========================
+# シャード上のデータの片付け（app/shards.py）
+# ==========================
+# カタログの削除がロールバックされたときにシャードのデータだけ消えないよう、コミット後に行う
+# （削除のあと instance.pk は None になるので、id は先に取っておく）
+@receiver(post_delete, sender=MoveInfo)
+def delete_household_shard_rows(sender, instance, using, **kwargs):
+    move_info_id = instance.pk
+    transaction.on_commit(lambda: shards.delete_household_rows(move_info_id), using=using)
+
+
+@receiver(post_delete, sender=CustomUser)
+def delete_user_shard_rows(sender, instance, using, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: shards.delete_user_rows(user_id), using=using)
+
+
+# ==========================
+# 世帯キャッシュの無効化（app/household_cache.py）
+# ==========================
+# メンバー一覧に表示する項目（ログイン日時などの更新ではキャッシュを捨てない）
+HOUSEHOLD_USER_FIELDS = {"full_name", "email", "move_info"}
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_household_data(sender, instance, using, **kwargs):
+    invalidate_household(instance.move_info_id, using)
+
+
+@receiver(post_save, sender=MoveInfo)
+@receiver(post_delete, sender=MoveInfo)
+def invalidate_move_info(sender, instance, using, **kwargs):
+    invalidate_household(instance.pk, using)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_member_households(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and not HOUSEHOLD_USER_FIELDS & set(update_fields):
+        return
+    invalidate_household(instance.move_info_id, using)
+    previous = getattr(instance, "_previous_move_info_id", None)
+    if previous != instance.move_info_id:
+        invalidate_household(previous, using)
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_deleted_member_household(sender, instance, using, **kwargs):
+    invalidate_household(instance.move_info_id, using)
+
+
+# ==========================
+# ログインユーザーのキャッシュ（app/auth_backends.py）
+# ==========================
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, using, **kwargs):
+    forget_user(instance.pk, using)
+
+
+# ==========================
+# 掲示板のリアルタイム更新（app/events.py）
+# ==========================
+@receiver(post_save, sender=Message)
+def publish_new_message(sender, instance, created, using, raw=False, **kwargs):
+    if not created or raw:
+        return
+    events.publish(instance.move_info_id, {"type": "message", "message": events.message_payload(instance)}, using)
+    events.publish(instance.move_info_id, {"type": "unread", "user_id": instance.receiver_id}, using)
+
+
+@receiver(post_delete, sender=Message)
+def publish_deleted_message(sender, instance, using, **kwargs):
+    events.publish(instance.move_info_id, {"type": "message_deleted", "id": instance.pk}, using)
+    events.publish(instance.move_info_id, {"type": "unread", "user_id": instance.receiver_id}, using)
@@ -0,0 +1,132 @@
+# app/templatetags/assets.py
+"""
+CSS・画像の読み込み（build_css / optimize_images で作ったファイル）
+
+    {% load assets %}
+    {% css_bundle 'message_list' %}
+    {% responsive_img 'img/homugamen2_pc.png' alt='…' sizes='(max-width: 850px) 100vw, 850px' %}
+    {% image_url 'img/erzu.svg' %}
+
+- バンドルがあれば、クリティカル CSS を <style> で埋め込み、残り（common.css ＋ ページの CSS を
+  minify したもの）は描画を止めずに読み込む
+- build_css をまだ実行していなければ、今まで通り common.css とページの CSS を <link> で読み込む
+  （DEBUG でないときは collectstatic 済みのバンドルだけを使う）
+- optimize_images の画像があれば、横幅ごとの WebP / 元の形式を srcset で並べ、画面に合うものだけを読ませる
+"""
+import json
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# responsive_img の mobile 画像に切り替える画面幅（portfolio.css のスマホ用のブレークポイント）
+MOBILE_MEDIA = "(max-width: 768px)"
+
+
+def _read_static(name):
+    """静的ファイルの中身（DEBUG 中は STATICFILES_DIRS、それ以外は STATIC_ROOT から読む）。無ければ None"""
+    if settings.DEBUG:
+        path = finders.find(name)
+        if not path:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    if not staticfiles_storage.exists(name):
+        return None
+    with staticfiles_storage.open(name) as f:
+        return f.read().decode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _built_bundles():
+    content = _read_static("bundles/manifest.json")
+    return frozenset(json.loads(content)["bundles"]) if content else frozenset()
+
+
+@lru_cache(maxsize=None)
+def _critical_css(name):
+    # </style> で埋め込みが途切れないようにする
+    return (_read_static(f"bundles/{name}.critical.css") or "").replace("</", "<\\/")
+
+
+@register.simple_tag
+def css_bundle(name="common"):
+    """common.css ＋ ページの CSS を読み込む（name は app/static/css のファイル名から .css を除いたもの）"""
+    if name not in _built_bundles():
+        links = [format_html('<link rel="stylesheet" href="{}">', static("css/common.css"))]
+        if name != "common":
+            links.append(format_html('<link rel="stylesheet" href="{}">', static(f"css/{name}.css")))
+        return mark_safe("\n".join(links))
+
+    href = static(f"bundles/{name}.css")
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(_critical_css(name)), href, href,
+    )
+
+
+@lru_cache(maxsize=None)
+def _optimized_images():
+    content = _read_static("optimized/images.json")
+    return json.loads(content) if content else {}
+
+
+def _srcset(variants):
+    return ", ".join(f"{static(name)} {width}w" for width, name in variants)
+
+
+def _sources(path, sizes, media=None, skip_type=None):
+    """path の <source> タグ（最適化していなければ元の画像1枚。skip_type の形式は <img> に任せる）"""
+    image = _optimized_images().get(path)
+    media_attr = format_html(' media="{}"', media) if media else ""
+    if image is None or "sources" not in image:
+        return [format_html('<source{} srcset="{}">', media_attr, static(path))]
+    return [
+        format_html('<source{} type="{}" srcset="{}" sizes="{}">', media_attr, content_type, _srcset(variants), sizes)
+        for content_type, variants in image["sources"].items()
+        if content_type != skip_type
+    ]
+
+
+@register.simple_tag
+def responsive_img(path, alt="", sizes="100vw", mobile=None, mobile_sizes="100vw", loading="lazy", **attrs):
+    """
+    画面幅に合った画像だけを読み込む <picture>（path は static からのパス）
+    - mobile: スマホ用に別の画像を出すとき（MOBILE_MEDIA の幅以下で切り替える）
+    - loading: 最初の画面に見える画像（LCP）は loading='eager' fetchpriority='high' にする
+    - それ以外のキーワード引数（class など）は <img> の属性になる
+    """
+    tags = _sources(mobile, mobile_sizes, MOBILE_MEDIA) if mobile else []
+
+    image = _optimized_images().get(path)
+    if image is not None and "sources" in image:
+        fallback = image["sources"][image["type"]]
+        tags += _sources(path, sizes, skip_type=image["type"])
+        attrs.update(
+            src=static(fallback[-1][1]), srcset=_srcset(fallback), sizes=sizes,
+            width=image["width"], height=image["height"],
+        )
+    else:
+        attrs["src"] = static(path)
+
+    attrs.update(alt=alt, loading=loading, decoding="async")
+    tags.append(format_html("<img{}>", mark_safe("".join(
+        format_html(' {}="{}"', name, value) for name, value in attrs.items()
+    ))))
+    return format_html("<picture>{}</picture>", mark_safe("".join(tags)))
+
+
+@register.simple_tag
+def image_url(path):
+    """最適化した画像の URL（optimize_images を実行していなければ元の画像）"""
+    image = _optimized_images().get(path)
+    return static(image["src"] if image and "src" in image else path)
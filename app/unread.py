@@ -0,0 +1,73 @@
+# app/unread.py
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import events
+from .models import MessageReadState
+from .queries import unread_messages
+from .shards import for_household
+
+# 未読件数キャッシュの有効期限（メッセージの作成・削除・既読で随時更新する）
+UNREAD_COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def _unread_count_key(user_id):
+    return f"unread_message_count:{user_id}"
+
+
+def get_unread_count(user):
+    """未読件数を返す（キャッシュに無いときだけ数え直す）"""
+    if not user.move_info_id:
+        return 0
+    key = _unread_count_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = unread_messages(user.pk, user.move_info_id).count()
+        # 数え直している間に増減があった場合はそちらを優先する
+        cache.add(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def increment_unread_count(user_id, delta=1):
+    """未読件数を増やす（キャッシュに無ければ次回表示時に数え直す）"""
+    try:
+        cache.incr(_unread_count_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def decrement_unread_count(user_id, delta=1):
+    """未読件数を減らす（0未満になったら数え直しに任せる）"""
+    if delta <= 0:
+        return
+    key = _unread_count_key(user_id)
+    try:
+        count = cache.decr(key, delta)
+    except ValueError:
+        return
+    if count < 0:
+        cache.delete(key)
+
+
+def reset_unread_count(user_id):
+    """キャッシュを捨てて、次回表示時に数え直させる"""
+    cache.delete(_unread_count_key(user_id))
+
+
+def mark_board_read(user):
+    """掲示板を開いたときに既読位置を今に進める
+    未読が無ければ何も書き込まない。書き込みは既読位置1行の UPSERT だけ
+    """
+    if not user.move_info_id or not get_unread_count(user):
+        return
+    # bulk_create は instance のヒントが無いのでシャードを指定する
+    for_household(MessageReadState, user.move_info_id).bulk_create(
+        [MessageReadState(user=user, move_info_id=user.move_info_id, last_read_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=["user", "move_info"],
+        update_fields=["last_read_at"],
+    )
+    # 既読位置の直後に届いたメッセージを取りこぼさないよう、件数は数え直させる
+    reset_unread_count(user.pk)
+    # 同じユーザーの他のタブのバッジも消す
+    events.publish(user.move_info_id, {"type": "unread", "user_id": user.pk})
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, views_async
 from .forms import EmailAuthenticationForm, CustomPasswordChangeForm
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
@@ -15,8 +15,8 @@ urlpatterns = [
     path('home/', login_required(views.home_view), name='home'),
     path('task/create/', login_required(views.task_create_view), name='task_create'),
     path('task/', views.task_list_view, name='task_list'),
-    path('task/toggle/<int:task_id>/', views.toggle_task_completion, name='toggle_task_completion'),
-    path('task/delete/<int:task_id>/', views.delete_task_view, name='delete_task'),
+    path('task/toggle/<int:task_id>/', views_async.toggle_task_completion, name='toggle_task_completion'),
+    path('task/delete/<int:task_id>/', views_async.delete_task_view, name='delete_task'),
     path('task/edit/<int:task_id>/', login_required(views.task_edit_view), name='task_edit'),
     path('calendar/', login_required(views.calendar_view), name='calendar'),
     path('mypage/', login_required(views.mypage_view), name='mypage'),
@@ -37,7 +37,7 @@ urlpatterns = [
     
     # === メンバー関連 ===
     path('invite_member/', login_required(views.invite_member_view), name='invite_member'),
-    path('generate_invite_url/', login_required(views.generate_invite_url), name='generate_invite_url'),
+    path('generate_invite_url/', views_async.generate_invite_url, name='generate_invite_url'),
     path('member_list/', login_required(views.member_list_view), name='member_list'),
     path("members/remove/<int:user_id>/", views.member_remove_view, name="member_remove"),
     path("invite/accept/", views.accept_invite_view, name="accept_invite"),
@@ -45,8 +45,10 @@ urlpatterns = [
     # === メッセージ関連 ===
     path('message/register/', login_required(views.message_register_view), name='message_register'),
     path("message/list/", login_required(views.message_list_view), name="message_list"),
+    path("message/list/more/", login_required(views.message_list_more_view), name="message_list_more"),
+    path("message/events/", views_async.message_events_view, name="message_events"),
     path('message/save/', login_required(views.save_message_view), name='save_message'),
-    path("message/delete/<int:message_id>/", login_required(views.delete_message_view), name="delete_message"),
+    path("message/delete/<int:message_id>/", views_async.delete_message_view, name="delete_message"),
     
     # === メールアドレス変更 ===
     path('change_email/', login_required(views.change_email_view), name='change_email'),
@@ -60,11 +62,13 @@ urlpatterns = [
     
     # === カレンダー ===
     #path('calendar/', views.calendar_view, name='calendar'),
-    path('calendar/day/', views.day_tasks_json, name='day_tasks_json'),
+    path('calendar/day/', views_async.day_tasks_json, name='day_tasks_json'),
+    path('calendar/feed/token/', views.calendar_feed_token_view, name='calendar_feed_token'),
+    path('calendar/feed/<uuid:token>.ics', views_async.calendar_feed_view, name='calendar_feed'),
     
     # === トップはログイン画面へ ===
     path('', lambda request: redirect('login'), name='root_redirect'),
     
     # === ホーム画面の日付作成でmoveinfo作成 ===
-    path("set-move-date/", views.set_move_date_view, name="set_move_date"),
+    path("set-move-date/", views_async.set_move_date_view, name="set_move_date"),
 ]
\ No newline at end of file
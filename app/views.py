@@ -1,24 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, update_session_auth_hash
+from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.views import PasswordChangeView
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
-from django.urls import reverse, reverse_lazy
+from django.urls import reverse
 from django.utils import timezone
-from django.utils.safestring import mark_safe
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
 from django.db.models import Count, Q
-from .forms import CustomUserCreationForm, TaskForm, CustomPasswordChangeForm
+from .household_cache import household_cached
+from .page_cache import stale_while_revalidate
+from .forms import CustomUserCreationForm, TaskForm
 from .models import Invite, Task, CustomUser, Message, MoveInfo
+from . import search
+from .outbox import enqueue_email
+from .queries import calendar_task_rows, message_board_rows, task_list_rows
+from .shards import find_invite, for_household, household_atomic
+from .unread import mark_board_read
 from django.core.mail import send_mail, BadHeaderError, EmailMessage
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
 from django.views.decorators.http import require_POST
 from datetime import date
 import calendar as pycal
-import uuid, json
-from urllib.parse import urlencode
+import uuid
 from django.conf import settings
 
 
@@ -38,20 +44,21 @@ def login_view(request):
 
 # --- ホーム・共通画面 ---
 @login_required
+@stale_while_revalidate("home")
 def home_view(request):
     user = request.user
     
-    move_info = user.move_info if user.move_info else None
-    move_date = move_info.move_date if move_info else None
-    
-    total_tasks = Task.objects.filter(move_info=move_info).count() if move_info else 0
-    completed_tasks = Task.objects.filter(move_info=move_info, is_completed=True).count() if move_info else 0
-    
-    # タスクが1件もない場合は0%にする
-    if total_tasks == 0:
-        progress_rate = 0
+    def load_summary():
+        move_info = user.move_info
+        # 達成度は MoveInfo のカウンタから計算する（タスクを数え直さない）
+        return {"move_date": move_info.move_date, "progress_rate": move_info.progress_rate}
+
+    if user.move_info_id:
+        summary = household_cached(user.move_info_id, "home", load_summary)
     else:
-        progress_rate = int((completed_tasks / total_tasks) * 100)
+        summary = {"move_date": None, "progress_rate": 0}
+    move_date = summary["move_date"]
+    progress_rate = summary["progress_rate"]
         
     is_move_date_set = move_date is not None
     
@@ -107,7 +114,7 @@ def account_manage_view(request):
             else:
                 user.move_info.move_date = move_date
                 user.move_info.updated_by = user
-                user.move_info.save(update_fields=["move_date", "updated_by"])
+                user.move_info.save(update_fields=["move_date", "updated_by", "updated_at"])
 
         messages.success(request, "アカウント情報を更新しました。")
         return redirect("account_manage")
@@ -127,9 +134,14 @@ def member_list_view(request):
     if not user.move_info:
         return redirect("invite_member")
     
-    members = CustomUser.objects.filter(move_info=user.move_info)
+    # 表示に使う項目だけをキャッシュする
+    members = household_cached(user.move_info_id, "members", lambda: list(
+        CustomUser.objects.filter(move_info=user.move_info_id)
+        .order_by("id")
+        .values("id", "full_name", "email")
+    ))
     
-    is_owner = (user == user.move_info.owner)
+    is_owner = (user.pk == user.move_info.owner_id)
     
     return render(
         request,
@@ -195,32 +207,6 @@ def member_remove_view(request, user_id):
     return redirect("member_list")
 
 
-# --- 招待URL生成（有効期限付き・一度限り） ---
-@login_required
-def generate_invite_url(request):
-    """UUID付き招待URLを生成して返す（24時間有効・一度限り）"""
-    user = request.user
-    
-    # MoveInfo を持っていない人は招待不可
-    if not user.move_info:
-        return JsonResponse({'error': 'no_move_info'}, status=400)
-    
-    move_info = user.move_info
-    
-    # owner 以外は招待不可
-    if move_info.owner != user:
-        return JsonResponse({'error': 'permission_denied'}, status=403)
-    
-    if request.method == "POST":
-        invite = Invite.objects.create(move_info=move_info)
-        
-        params = urlencode({"invite": str(invite.code)})
-        invite_url = request.build_absolute_uri(reverse('signup')) + "?" + params
-        
-        return JsonResponse({'invite_url': invite_url})
-    
-    return JsonResponse({'error': 'Invalid request'}, status=400)
-
 @login_required
 def accept_invite_view(request):
     """ログイン済みユーザーが招待コードで MoveInfo に参加する"""
@@ -230,7 +216,7 @@ def accept_invite_view(request):
     
     try:
         uuid.UUID(invite_code)
-        invite = Invite.objects.select_related("move_info").get(code=invite_code)
+        invite = find_invite(invite_code)
     
     except (ValueError, ValidationError, Invite.DoesNotExist):
         return render(request, "registration/invite_invalid.html")
@@ -269,7 +255,7 @@ def signup_view(request):
     if invite_code:
         try:
             uuid.UUID(invite_code)
-            invite = Invite.objects.select_related('move_info').get(code=invite_code)
+            invite = find_invite(invite_code)
             
         except (ValueError, ValidationError, Invite.DoesNotExist):
         # 無効なリンク
@@ -335,7 +321,7 @@ def save_message_view(request):
 
         receiver = CustomUser.objects.filter(email=receiver_email, move_info=request.user.move_info).first()
         if receiver and content:
-            Message.objects.create(sender=request.user, receiver=receiver, content=content, move_info=request.user.move_info)
+            for_household(Message, request.user.move_info_id).create(sender=request.user, receiver=receiver, content=content, move_info=request.user.move_info)
         return redirect('member_list')
 
 
@@ -365,15 +351,15 @@ def change_email_view(request):
         token = uuid.uuid4()
         user.new_email = new_email
         user.email_change_token = token
-        user.save()
 
-        # 確認メール送信
+        # 確認メール（送信は Outbox のワーカーが行う）
         confirm_url = request.build_absolute_uri(
             reverse('confirm_email', args=[token])
         )
         
-        try:
-            email = EmailMessage(
+        with transaction.atomic():
+            user.save()
+            enqueue_email(
                 subject="【引越しGO】メールアドレス確認のお願い",
                 body=(
                     f"{user.full_name or user.email} さん\n\n"
@@ -384,10 +370,6 @@ def change_email_view(request):
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 to=[new_email],
             )
-            email.send(fail_silently=False)
-        except Exception as e:
-            messages.error(request, f"メール送信に失敗しました: {e}")
-            return redirect("change_email")
             
         messages.success(request, f"{new_email} 宛に確認メールを送信しました。")
         return redirect("change_email_done")
@@ -438,7 +420,11 @@ def task_create_view(request):
             elif task_mode == "custom":
                 task.task_name = form.cleaned_data.get("custom_task")
 
-            task.save()
+            # タスクが変わった時刻はカウンタと一緒に書く（signals.touch_household_tasks を飛ばす）
+            task._counters_adjusted = True
+            with household_atomic(user.move_info_id):
+                task.save()
+                user.move_info.adjust_task_counters(total=1, completed=int(task.is_completed))
             return redirect('task_list')
         else:
             print("フォームエラー:", form.errors)
@@ -448,40 +434,63 @@ def task_create_view(request):
     return render(request, 'task_create.html', {'form': form})
 
 
+# タスク検索で表示する最大件数
+TASK_SEARCH_LIMIT = 50
+
+
 @login_required
+@stale_while_revalidate("task_list")
 def task_list_view(request):
     user = request.user
     
-    if user.move_info:
-        tasks = Task.objects.filter(move_info=user.move_info).order_by("date")
+    query = request.GET.get("q", "").strip()
+    
+    if not user.move_info:
+        tasks = for_household(Task, None).none()
+    elif _use_search(query):
+        # キーワード検索（全文検索の索引から順位順）
+        tasks = search.search_tasks(user.move_info, query, TASK_SEARCH_LIMIT)
+    elif query:
+        tasks = task_list_rows(user.move_info).filter(
+            Q(task_name__icontains=query) |
+            Q(custom_task__icontains=query) |
+            Q(memo__icontains=query)
+        )[:TASK_SEARCH_LIMIT]
     else:
-        tasks = Task.objects.none()
+        tasks = household_cached(
+            user.move_info_id, "task_list", lambda: list(task_list_rows(user.move_info_id))
+        )
     
-    return render(request, 'task_list.html', {'tasks': tasks, 'has_move_info': bool(user.move_info)})
+    return render(request, 'task_list.html', {
+        'tasks': tasks,
+        'has_move_info': bool(user.move_info),
+        'query': query,
+    })
 
 
-@login_required
-def toggle_task_completion(request, task_id):
-    """タスク完了／未完を切り替える"""
-    task = get_object_or_404(Task, id=task_id, move_info=request.user.move_info)
-    
-    task.is_completed = not task.is_completed
-    task.save()
-    
-    return JsonResponse({'status': 'ok', 'is_completed': task.is_completed})
+def _toggle_task(task, move_info):
+    """完了／未完を切り替えてカウンタを合わせる（views_async から sync_to_async で呼ぶ）"""
+    with household_atomic(move_info.pk):
+        # 読んだ時点の状態から切り替えられた場合だけカウンタを動かす（同時押し対策）
+        toggled = Task.objects.using(task._state.db).filter(pk=task.pk, is_completed=task.is_completed).update(
+            is_completed=not task.is_completed
+        )
+        if toggled:
+            task.is_completed = not task.is_completed
+            move_info.adjust_task_counters(completed=1 if task.is_completed else -1)
 
 
-@login_required
-def delete_task_view(request, task_id):
-    """タスク削除処理"""
-    task = get_object_or_404(Task, id=task_id, move_info=request.user.move_info)
-    task.delete()
-    return JsonResponse({'status': 'ok'})
+def _delete_task(task, move_info):
+    """タスクを削除してカウンタを合わせる（views_async から sync_to_async で呼ぶ）"""
+    task._counters_adjusted = True
+    with household_atomic(move_info.pk):
+        if task.delete()[0]:
+            move_info.adjust_task_counters(total=-1, completed=-int(task.is_completed))
 
 
 @login_required
 def task_edit_view(request, task_id):
-    task = get_object_or_404(Task, id=task_id, move_info=request.user.move_info)
+    task = get_object_or_404(for_household(Task, request.user.move_info_id), id=task_id, move_info=request.user.move_info)
     
     if request.method == 'POST':
         form = TaskForm(request.POST, instance=task)
@@ -494,9 +503,21 @@ def task_edit_view(request, task_id):
     return render(request, 'task_edit.html', {'form': form})
 
 
+def _calendar_task_item(row):
+    """タスク1件をモーダル表示用の辞書に整形する"""
+    return {
+        'id': row['id'],
+        'title': row['custom_task'] or row['task_name'] or '',
+        'start_time': row['start_time'].strftime('%H:%M') if row['start_time'] else '',
+        'end_time': row['end_time'].strftime('%H:%M') if row['end_time'] else '',
+        'memo': row['memo'] or '',
+    }
+
+
 @login_required
+@stale_while_revalidate("calendar")
 def calendar_view(request):
-    """全てのタスクをカレンダーに反映"""
+    """表示中の月（カレンダーのグリッド範囲）のタスクだけを日付ごとにまとめて渡す"""
     
     from datetime import datetime, timedelta, timezone
     JST = timezone(timedelta(hours=9))
@@ -509,48 +530,70 @@ def calendar_view(request):
     cal = pycal.Calendar(firstweekday=6)
     weeks = cal.monthdatescalendar(year, month)
     
-    # 「全タスク」を取得（期間指定なし）
-    tasks = (
-        Task.objects.filter(move_info=request.user.move_info,)
-        .values('date', 'task_name', 'start_time', 'end_time', 'memo')
-    )
-    
-    # JSON化
-    tasks_data = list(tasks)
+    # グリッドの先頭〜末尾の日付だけを1回のクエリで取得
+    def load_tasks_by_date():
+        # 「日付 → タスク一覧」の索引（日付クリックのモーダルもこれを使う）
+        tasks_by_date = {}
+        rows = calendar_task_rows(request.user.move_info_id, weeks[0][0], weeks[-1][-1])
+        for row in rows:
+            tasks_by_date.setdefault(row['date'].isoformat(), []).append(_calendar_task_item(row))
+        return tasks_by_date
+
+    tasks_by_date = {}
+    if request.user.move_info_id:
+        tasks_by_date = household_cached(
+            request.user.move_info_id, f"calendar:{year}-{month}", load_tasks_by_date
+        )
+
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    feed_url = _calendar_feed_url(request)
+
     context = {
         'year': year,
         'month': month,
         'weeks': weeks,
-        'tasks_json': mark_safe(json.dumps(tasks_data, default=str)),
+        'tasks_by_date': tasks_by_date,
         'today': today,
+        'prev_year': prev_year,
+        'prev_month': prev_month,
+        'next_year': next_year,
+        'next_month': next_month,
+        'calendar_feed_url': feed_url,
+        'calendar_feed_webcal_url': 'webcal://' + feed_url.split('://', 1)[1] if feed_url else None,
+        'can_issue_calendar_feed': _can_issue_calendar_feed(request.user),
     }
         
     return render(request, 'calendar.html', context)
 
 
-@login_required
-def day_tasks_json(request):
-    """日付クリックでモーダルに表示するタスク一覧(JSON)"""
-    ymd = request.GET.get('date')
-    if not ymd:
-        return JsonResponse({'tasks': []})
-
-    items = (
-        Task.objects.filter(move_info=request.user.move_info, date=ymd)
-        .order_by('start_time', 'end_time', 'id')
-    )
+# --- カレンダー購読（ICS） ---
+def _calendar_feed_url(request):
+    """カレンダー購読の URL（トークンを発行していなければ None）"""
+    move_info = request.user.move_info
+    if move_info is None or move_info.calendar_token is None:
+        return None
+    return request.build_absolute_uri(reverse('calendar_feed', args=[move_info.calendar_token]))
 
-    data = [
-        {
-            'id': t.id,
-            'title': t.custom_task or t.task_name or '',
-            'start_time': t.start_time.strftime('%H:%M') if t.start_time else '',
-            'end_time': t.end_time.strftime('%H:%M') if t.end_time else '',
-            'memo': t.memo or '',
-        }
-        for t in items
-    ]
-    return JsonResponse({'tasks': data})
+
+def _can_issue_calendar_feed(user):
+    """最初の発行は世帯のメンバーなら誰でも、発行し直し（前の URL が使えなくなる）は管理者だけ"""
+    move_info = user.move_info
+    if move_info is None:
+        return False
+    return move_info.calendar_token is None or move_info.owner_id == user.pk
+
+
+@login_required
+@require_POST
+def calendar_feed_token_view(request):
+    """カレンダー購読の URL のトークンを発行する"""
+    if _can_issue_calendar_feed(request.user):
+        move_info = request.user.move_info
+        move_info.calendar_token = uuid.uuid4()
+        move_info.save(update_fields=['calendar_token'])
+    return redirect('calendar')
 
 
 @login_required
@@ -565,115 +608,119 @@ def message_register_view(request):
         if receiver_id and content:
             receiver = get_object_or_404(CustomUser, id=receiver_id, move_info=request.user.move_info)
             
-            Message.objects.create(
+            for_household(Message, request.user.move_info_id).create(
                 sender=request.user,
                 receiver=receiver,
                 content=content,
                 move_info=request.user.move_info,
-                is_read=False,
             )
             return redirect("message_list")
 
     return render(request, "message_register.html", {"members": members})
 
 
+# 掲示板の1ページあたりの件数
+MESSAGE_PAGE_SIZE = 30
+
+
+def _encode_message_cursor(row):
+    """メッセージ行から (created_at, id) のカーソル文字列を作る"""
+    return f"{row['created_at'].isoformat()}_{row['id']}"
+
+
+def _decode_message_cursor(cursor, query=None):
+    """カーソル文字列を戻す（不正なら None）
+    - キーワード検索中: ページ番号（検索結果は順位順なのでページ番号で送る）
+    - 通常: (created_at, id)
+    """
+    if _use_search(query):
+        return int(cursor) if cursor.isdigit() else None
+
+    created_at, _, message_id = cursor.rpartition("_")
+    created_at = parse_datetime(created_at)
+    if created_at is None or not message_id.isdigit():
+        return None
+    return created_at, int(message_id)
+
+
+def _use_search(query):
+    """キーワードを全文検索の索引で探すか"""
+    return bool(query) and search.is_available()
+
+
+def _message_board_page(move_info, query=None, cursor=None):
+    """掲示板の1ページ分を取得する
+    - 通常: OFFSET ではなく (created_at, id) のカーソルでページング
+    - キーワード検索: 全文検索の索引から順位順に取得
+    """
+    # 1件多く取って「続きがあるか」を判定する
+    if _use_search(query):
+        page = cursor or 0
+        rows = search.search_messages(
+            move_info, query, MESSAGE_PAGE_SIZE + 1, page * MESSAGE_PAGE_SIZE
+        )
+        next_cursor = str(page + 1) if len(rows) > MESSAGE_PAGE_SIZE else None
+    else:
+        rows = list(message_board_rows(move_info, query, cursor)[:MESSAGE_PAGE_SIZE + 1])
+        next_cursor = _encode_message_cursor(rows[MESSAGE_PAGE_SIZE - 1]) if len(rows) > MESSAGE_PAGE_SIZE else None
+
+    rows = rows[:MESSAGE_PAGE_SIZE]
+
+    return rows, next_cursor
+
+
 @login_required
 def message_list_view(request):
-    
-    if request.user.move_info:
-        Message.objects.filter(
-            receiver=request.user,
-            move_info=request.user.move_info,
-            is_read=False
-        ).update(is_read=True)
-    
     """メッセージ一覧（掲示板）"""
+    # 既読位置を進める（メッセージごとの更新はしない）
+    mark_board_read(request.user)
+
     query = request.GET.get("q")
-    
-    messages = Message.objects.filter(move_info=request.user.move_info).order_by('-created_at')
-    
-    # キーワードが入力された場合のみフィルタ
-    if query:
-        messages = messages.filter(
-            Q(content__icontains=query) |
-            Q(sender__full_name__icontains=query) |
-            Q(receiver__full_name__icontains=query)
+
+    if request.user.move_info_id and not query:
+        # 最初のページは世帯キャッシュから（キーワード検索はキャッシュしない）
+        messages, next_cursor = household_cached(
+            request.user.move_info_id, "message_board",
+            lambda: _message_board_page(request.user.move_info_id),
         )
+    elif request.user.move_info_id:
+        messages, next_cursor = _message_board_page(request.user.move_info, query)
+    else:
+        messages, next_cursor = [], None
+
+    return render(request, "message_list.html", {
+        "messages": messages,
+        "next_cursor": next_cursor,
+        "query": query or "",
+    })
 
-    return render(request, "message_list.html", {"messages": messages})
 
+@login_required
+def message_list_more_view(request):
+    """掲示板の「さらに読み込む」用（カーソルより古いメッセージをJSONで返す）"""
+    if not request.user.move_info:
+        return JsonResponse({"messages": [], "next_cursor": None})
 
-def portfolio_top_view(request):
-    return render(request, "portfolio_top.html")
+    query = request.GET.get("q")
+    cursor = _decode_message_cursor(request.GET.get("cursor", ""), query)
+    if cursor is None:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
 
+    rows, next_cursor = _message_board_page(request.user.move_info, query, cursor)
 
-@login_required
-@require_POST
-def delete_message_view(request, message_id):
-    msg = Message.objects.filter(id=message_id).first()
-    if not msg:
-        return JsonResponse({"error": "not found"}, status=404)
-    
-    # 自分が関係するメッセージだけ削除許可（安全）
-    if msg.sender != request.user and msg.receiver != request.user:
-        return JsonResponse({"error": "forbidden"}, status=403)
-    
-    msg.delete()
-    return JsonResponse({"status": "ok"})
+    data = [
+        {
+            "id": row["id"],
+            "sender_name": row["sender_name"] or "",
+            "receiver_name": row["receiver_name"] or "",
+            "content": row["content"],
+            "created_at": timezone.localtime(row["created_at"]).strftime("%Y/%m/%d %H:%M"),
+        }
+        for row in rows
+    ]
+    return JsonResponse({"messages": data, "next_cursor": next_cursor})
 
 
-@login_required
-def set_move_date_view(request):
-    """
-    引越し日を設定する共通View
-    - move_info がなければ作成
-    - あれば更新
-    """
-    if request.method != "POST":
-        return JsonResponse({"error": "POST only"}, status=405)
+def portfolio_top_view(request):
+    return render(request, "portfolio_top.html")
 
-    user = request.user
-    move_date = request.POST.get("move_date", "").strip()
-    
-    # move_info が無い & 削除（空）要求 → 何もしないでOK返す
-    if not move_date and user.move_info is None:
-        return JsonResponse({"status": "ok", "move_date": None})
-
-    # move_info がない場合は新規作成
-    if user.move_info is None:
-        move_info = MoveInfo.objects.create(
-            owner=user,
-            move_date=move_date,
-            updated_by=user,
-        )
-        user.move_info = move_info
-        user.save(update_fields=["move_info"])
-        return JsonResponse({"status": "ok", "move_date": move_date})
-    
-    # move_info がある & 削除（空）要求 → None を保存（削除）
-    if not move_date:
-        user.move_info.move_date = None
-        user.move_info.updated_by = user
-        user.move_info.save(update_fields=["move_date", "updated_by"])
-        return JsonResponse({"status": "ok", "move_date": None})
-
-    # move_info がある & 日付あり → 更新
-    user.move_info.move_date = move_date
-    user.move_info.updated_by = user
-    user.move_info.save(update_fields=["move_date", "updated_by"])
-
-    return JsonResponse({
-        "status": "ok",
-        "move_date": move_date
-    })
-    
-    
-    class CustomPasswordChangeView(PasswordChangeView):
-        form_class = CustomPasswordChangeForm
-        template_name = "registration/password_change.html"
-        success_url = reverse_lazy("password_change_done")
-        
-        def form_valid(self, form):
-            response = super().form_valid(form)
-            update_session_auth_hash(self.request, form.user)
-            return response
\ No newline at end of file
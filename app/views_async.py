@@ -0,0 +1,241 @@
+# app/views_async.py
+"""
+フロントエンドからよく呼ばれる JSON エンドポイントの async 版（asgi.py で動かす）
+
+- ORM は async API（aget / afirst / acreate / asave / adelete / async for）を使う
+- transaction.atomic は async で使えないので、その部分だけ sync_to_async で views の処理を呼ぶ
+- ユーザーは request.auser() で取得する（request.user に触ると同期の DB アクセスになる）
+"""
+from urllib.parse import urlencode
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_POST, require_safe
+
+from . import events, ics
+from .models import CustomUser, Invite, Message, MoveInfo, Task
+from .queries import calendar_feed_rows, day_task_rows
+from .shards import for_household
+from .unread import get_unread_count
+from .views import _calendar_task_item, _delete_task, _toggle_task
+
+
+async def _move_info(user):
+    """ユーザーの MoveInfo（認証バックエンドで読み込み済みならクエリしない）"""
+    if user.move_info_id is None:
+        return None
+    if CustomUser.move_info.is_cached(user):
+        return user.move_info
+    return await MoveInfo.objects.select_related("owner").aget(pk=user.move_info_id)
+
+
+# --- カレンダー ---
+@login_required
+async def day_tasks_json(request):
+    """日付クリックでモーダルに表示するタスク一覧(JSON)"""
+    user = await request.auser()
+    ymd = request.GET.get('date')
+    if not ymd:
+        return JsonResponse({'tasks': []})
+
+    rows = [row async for row in day_task_rows(user.move_info_id, ymd)]
+
+    return JsonResponse({'tasks': [_calendar_task_item(row) for row in rows]})
+
+
+# カレンダー購読で、まとめて送るタスクの件数
+CALENDAR_FEED_BATCH = 100
+
+
+@require_safe
+async def calendar_feed_view(request, token):
+    """
+    世帯のタスクの iCalendar（カレンダーアプリから購読する。ログインの代わりに URL のトークンで世帯を決める）
+    - ETag / Last-Modified は世帯の最終更新時刻（タスク・引越し日）。変わっていなければ 304
+    - 本文はタスクを少しずつ読みながら送る（ASGI のみ。WSGI ではまとめて送られる）
+    """
+    move_info = await MoveInfo.objects.filter(calendar_token=token).values(
+        "pk", "move_date", "updated_at", "tasks_updated_at"
+    ).afirst()
+    if move_info is None:
+        return HttpResponse(status=404)
+
+    move_info_id = move_info["pk"]
+    last_modified = max(move_info["updated_at"], move_info["tasks_updated_at"])
+    etag = f'"{move_info_id:x}-{int(last_modified.timestamp() * 1_000_000):x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if response is None:
+        async def stream():
+            yield ics.calendar_header()
+            if move_info["move_date"]:
+                yield ics.move_day_event(move_info_id, move_info["move_date"], last_modified)
+            batch = []
+            async for row in calendar_feed_rows(move_info_id).aiterator(chunk_size=CALENDAR_FEED_BATCH * 5):
+                batch.append(ics.task_event(move_info_id, row, last_modified))
+                if len(batch) >= CALENDAR_FEED_BATCH:
+                    yield "".join(batch)
+                    batch = []
+            yield "".join(batch) + ics.calendar_footer()
+
+        response = StreamingHttpResponse(stream(), content_type="text/calendar; charset=utf-8")
+        response["Content-Disposition"] = 'inline; filename="hikkoshigo.ics"'
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    # 購読側のキャッシュは毎回 ETag で確かめさせる（URL にトークンが入っているので共有キャッシュには置かない）
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# --- タスク ---
+@login_required
+async def toggle_task_completion(request, task_id):
+    """タスク完了／未完を切り替える"""
+    user = await request.auser()
+    task = await aget_object_or_404(for_household(Task, user.move_info_id), id=task_id, move_info=user.move_info_id)
+    await sync_to_async(_toggle_task)(task, await _move_info(user))
+    return JsonResponse({'status': 'ok', 'is_completed': task.is_completed})
+
+
+@login_required
+async def delete_task_view(request, task_id):
+    """タスク削除処理"""
+    user = await request.auser()
+    task = await aget_object_or_404(for_household(Task, user.move_info_id), id=task_id, move_info=user.move_info_id)
+    await sync_to_async(_delete_task)(task, await _move_info(user))
+    return JsonResponse({'status': 'ok'})
+
+
+# --- メッセージ ---
+@login_required
+@require_POST
+async def delete_message_view(request, message_id):
+    user = await request.auser()
+    msg = await for_household(Message, user.move_info_id).filter(id=message_id).afirst()
+    if not msg:
+        return JsonResponse({"error": "not found"}, status=404)
+
+    # 自分が関係するメッセージだけ削除許可（安全）
+    if user.pk not in (msg.sender_id, msg.receiver_id):
+        return JsonResponse({"error": "forbidden"}, status=403)
+
+    await msg.adelete()
+    return JsonResponse({"status": "ok"})
+
+
+# SSE のハートビート間隔（秒）。途中のプロキシに接続を切られないようにする
+EVENT_STREAM_HEARTBEAT = 15
+
+# 切断されたときに EventSource が再接続するまでの時間（ミリ秒）
+EVENT_STREAM_RETRY_MS = 5000
+
+
+def _sse(event):
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@login_required
+async def message_events_view(request):
+    """掲示板の更新（新着・削除・未読件数）を Server-Sent Events で送る（ASGI のみ）"""
+    user = await request.auser()
+    # WSGI では接続ごとにワーカーを占有してしまうので配信しない（204 なら EventSource は再接続しない）
+    if user.move_info_id is None or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    subscription = events.subscribe(user.move_info_id, user.pk)
+
+    async def stream():
+        try:
+            yield f"retry: {EVENT_STREAM_RETRY_MS}\n\n"
+            # 接続時点の未読件数（再接続までの間に変わった分もここで合わせる）
+            yield _sse({"type": "unread", "count": await sync_to_async(get_unread_count)(user)})
+            while True:
+                try:
+                    event = await subscription.get(EVENT_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event["type"] == "unread":
+                    # 件数は受け取った側で数える（キャッシュにあればクエリしない）
+                    event = {"type": "unread", "count": await sync_to_async(get_unread_count)(user)}
+                yield _sse(event)
+        finally:
+            events.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# --- 引越し日 ---
+@login_required
+async def set_move_date_view(request):
+    """
+    引越し日を設定する共通View
+    - move_info がなければ作成
+    - あれば更新
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+
+    user = await request.auser()
+    move_date = request.POST.get("move_date", "").strip()
+    move_info = await _move_info(user)
+
+    # move_info が無い & 削除（空）要求 → 何もしないでOK返す
+    if not move_date and move_info is None:
+        return JsonResponse({"status": "ok", "move_date": None})
+
+    # move_info がない場合は新規作成
+    if move_info is None:
+        move_info = await MoveInfo.objects.acreate(
+            owner=user,
+            move_date=move_date,
+            updated_by=user,
+        )
+        user.move_info = move_info
+        await user.asave(update_fields=["move_info"])
+        return JsonResponse({"status": "ok", "move_date": move_date})
+
+    # move_info がある → 更新（空なら None を保存して削除）
+    move_info.move_date = move_date or None
+    move_info.updated_by = user
+    await move_info.asave(update_fields=["move_date", "updated_by", "updated_at"])
+
+    return JsonResponse({"status": "ok", "move_date": move_date or None})
+
+
+# --- 招待URL生成（有効期限付き・一度限り） ---
+@login_required
+async def generate_invite_url(request):
+    """UUID付き招待URLを生成して返す（24時間有効・一度限り）"""
+    user = await request.auser()
+    move_info = await _move_info(user)
+
+    # MoveInfo を持っていない人は招待不可
+    if move_info is None:
+        return JsonResponse({'error': 'no_move_info'}, status=400)
+
+    # owner 以外は招待不可
+    if move_info.owner_id != user.pk:
+        return JsonResponse({'error': 'permission_denied'}, status=403)
+
+    if request.method == "POST":
+        invite = await for_household(Invite, move_info.pk).acreate(move_info=move_info)
+
+        params = urlencode({"invite": str(invite.code)})
+        invite_url = request.build_absolute_uri(reverse('signup')) + "?" + params
+
+        return JsonResponse({'invite_url': invite_url})
+
+    return JsonResponse({'error': 'Invalid request'}, status=400)
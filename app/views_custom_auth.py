@@ -1,9 +1,10 @@
 # app/views_custom_auth.py
 from django.contrib.auth.views import PasswordResetView
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.utils.translation import gettext as _
 
+from .outbox import enqueue_email
+
 
 class CustomPasswordResetView(PasswordResetView):
 
@@ -18,11 +19,5 @@ class CustomPasswordResetView(PasswordResetView):
         # 本文の生成
         body = render_to_string(email_template_name, context)
 
-        # EmailMessage を使う → あなたの SendGrid API backend が動く！
-        email = EmailMessage(
-            subject=subject,
-            body=body,
-            from_email=from_email,
-            to=[to_email]
-        )
-        return email.send()  # ここで SendGridAPIEmailBackend が発動
\ No newline at end of file
+        # Outbox に登録（送信は send_outbox ワーカーが行う）
+        enqueue_email(subject=subject, body=body, to=[to_email], from_email=from_email)
@@ -0,0 +1,291 @@
+"""
+アドミッション制御（ワーカーごとの同時処理数の上限と、待ち行列のあふれ・待ち時間切れの 503）
+
+- リクエストを種類（read / write / email）に分け、種類ごとに同時に処理する数を制限する
+  （SQLite のロック待ちで遅くなった書き込みが、読み込みのワーカーまで使い切らないようにする）
+- 上限を超えたリクエストは順番に待つ。待ち行列があふれたとき・待ち時間が timeout を超えたときは
+  すぐに 503 と Retry-After を返す（待たせ続けて全員が遅くなるより、一部を早く断る）
+- ADMISSION_EXEMPT_PATHS（静的ファイル・ヘルスチェック・SSE・metrics）は制限しない
+- 上限は settings.ADMISSION_CONTROL。再起動せずに変えるときは admission_control コマンドで
+  キャッシュに上書きを入れる（各ワーカーが REFRESH_INTERVAL 秒ごとに読み直す）
+- 処理中・待ち中の数、断った件数は metrics_view で返す（ワーカーごと）
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+
+# キャッシュに入れる上書きのキー（admission_control コマンドが書く）
+OVERRIDES_CACHE_KEY = "admission_control:overrides"
+
+# 上書きを読み直す間隔（秒）
+REFRESH_INTERVAL = 5.0
+
+# 上限の項目（同時に処理する数・待てる数・待ち時間の上限（秒））
+LIMIT_FIELDS = ("concurrency", "queue", "timeout")
+
+# 503 の Retry-After（秒）
+RETRY_AFTER = 1
+
+# 読み込みのメソッド
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class _ThreadWaiter:
+    """同期の view（WSGI のスレッド）の待ち"""
+
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    """async の view（ASGI のイベントループ）の待ち"""
+
+    __slots__ = ("future",)
+
+    def __init__(self, loop):
+        self.future = loop.create_future()
+
+    def wake(self):
+        self.future.get_loop().call_soon_threadsafe(self._set)
+
+    def _set(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Gate:
+    """種類ごとの同時処理数の上限と待ち行列（先着順。sync / async どちらからも使える）
+    空いた枠は待っている先頭のリクエストにそのまま渡す（後から来たリクエストに追い越させない）
+    """
+
+    def __init__(self, name, concurrency, queue, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds = 0.0
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def configure(self, concurrency, queue, timeout):
+        with self._lock:
+            self.concurrency, self.queue, self.timeout = concurrency, queue, timeout
+            # 上限を上げたら、増えた分だけ待っているリクエストを通す
+            while self._waiters and self.in_flight < self.concurrency:
+                self.in_flight += 1
+                self._waiters.popleft().wake()
+
+    def _try_enter(self, waiter):
+        """すぐ通れるなら True、待ち行列に並んだら None、あふれたら False（ロックを取って呼ぶ）"""
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.shed["queue_full"] += 1
+            return False
+        self._waiters.append(waiter)
+        return None
+
+    def _give_up(self, waiter, waited, reason="timeout"):
+        """待つのをやめる。すでに枠を渡されていたら通す"""
+        with self._lock:
+            self.wait_seconds += waited
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                if reason:
+                    self.shed[reason] += 1
+                return False
+            self.admitted += 1
+            return True
+
+    def _entered(self, waited):
+        with self._lock:
+            self.wait_seconds += waited
+            self.admitted += 1
+        return True
+
+    def enter(self):
+        waiter = _ThreadWaiter()
+        with self._lock:
+            entered = self._try_enter(waiter)
+        if entered is not None:
+            return entered
+        start = time.monotonic()
+        if waiter.event.wait(self.timeout):
+            return self._entered(time.monotonic() - start)
+        return self._give_up(waiter, time.monotonic() - start)
+
+    async def aenter(self):
+        waiter = _AsyncWaiter(asyncio.get_running_loop())
+        with self._lock:
+            entered = self._try_enter(waiter)
+        if entered is not None:
+            return entered
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+        except asyncio.TimeoutError:
+            return self._give_up(waiter, time.monotonic() - start)
+        except asyncio.CancelledError:
+            # 待っている間に接続が切れた。渡された枠があれば返す
+            if self._give_up(waiter, time.monotonic() - start, reason=None):
+                self.leave()
+            raise
+        return self._entered(time.monotonic() - start)
+
+    def leave(self):
+        with self._lock:
+            if self._waiters and self.in_flight <= self.concurrency:
+                # 枠を待っている先頭に渡す（in_flight はそのまま）
+                self._waiters.popleft().wake()
+            else:
+                self.in_flight -= 1
+
+
+class AdmissionController:
+    """種類ごとの Gate と、キャッシュの上書きの読み直し"""
+
+    def __init__(self):
+        self.gates = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, limits):
+        for name, values in limits.items():
+            gate = self.gates.get(name)
+            if gate is None:
+                self.gates[name] = Gate(name, **values)
+            else:
+                gate.configure(**values)
+
+    def refresh_due(self):
+        return time.monotonic() - self._refreshed_at >= REFRESH_INTERVAL
+
+    def apply_overrides(self, overrides):
+        """settings の上限にキャッシュの上書きを重ねて反映する"""
+        with self._lock:
+            self._refreshed_at = time.monotonic()
+            self.configure(effective_limits(overrides))
+
+    def prometheus(self):
+        """metrics.registry.render_prometheus(extra=...) に渡す形"""
+        gates = sorted(self.gates.items())
+        return [
+            ("hikkoshigo_admission_in_flight", "Requests being processed, by route class.", "gauge",
+             [((("class", n),), g.in_flight) for n, g in gates]),
+            ("hikkoshigo_admission_waiting", "Requests waiting for a slot, by route class.", "gauge",
+             [((("class", n),), g.waiting) for n, g in gates]),
+            ("hikkoshigo_admission_concurrency_limit", "Concurrency limit, by route class.", "gauge",
+             [((("class", n),), g.concurrency) for n, g in gates]),
+            ("hikkoshigo_admission_admitted_total", "Requests admitted, by route class.", "counter",
+             [((("class", n),), g.admitted) for n, g in gates]),
+            ("hikkoshigo_admission_shed_total", "Requests rejected with 503, by route class and reason.", "counter",
+             [((("class", n), ("reason", r)), count) for n, g in gates for r, count in sorted(g.shed.items())]),
+            ("hikkoshigo_admission_wait_seconds_total", "Time spent waiting for a slot, by route class.", "counter",
+             [((("class", n),), g.wait_seconds) for n, g in gates]),
+        ]
+
+
+controller = AdmissionController()
+
+
+def effective_limits(overrides=None):
+    """settings.ADMISSION_CONTROL にキャッシュの上書き（{種類: {項目: 値}}）を重ねたもの"""
+    limits = {name: dict(values) for name, values in settings.ADMISSION_CONTROL.items()}
+    for name, values in (overrides or {}).items():
+        if name in limits:
+            limits[name].update({k: v for k, v in values.items() if k in LIMIT_FIELDS})
+    return limits
+
+
+class AdmissionControlMiddleware:
+    """同時処理数を制限する（RateLimitMiddleware の直後に置く。静的ファイルは StaticFilesMiddleware が先に返す）"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "ADMISSION_CONTROL", None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        static_url = settings.STATIC_URL if settings.STATIC_URL.startswith("/") else "/" + settings.STATIC_URL
+        self.exempt_paths = (static_url, *getattr(settings, "ADMISSION_EXEMPT_PATHS", ()))
+        self.email_routes = set(getattr(settings, "ADMISSION_EMAIL_ROUTES", ()))
+        controller.apply_overrides(cache.get(OVERRIDES_CACHE_KEY))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        gate = self._gate(request)
+        if gate is None:
+            return self.get_response(request)
+        if controller.refresh_due():
+            controller.apply_overrides(cache.get(OVERRIDES_CACHE_KEY))
+        if not gate.enter():
+            return self._service_unavailable(request)
+        try:
+            return self.get_response(request)
+        finally:
+            gate.leave()
+
+    async def __acall__(self, request):
+        gate = self._gate(request)
+        if gate is None:
+            return await self.get_response(request)
+        if controller.refresh_due():
+            controller.apply_overrides(await cache.aget(OVERRIDES_CACHE_KEY))
+        if not await gate.aenter():
+            return self._service_unavailable(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            gate.leave()
+
+    def _gate(self, request):
+        """リクエストの種類の Gate（制限しないパスなら None）"""
+        if request.path_info.startswith(self.exempt_paths):
+            return None
+        if request.method in SAFE_METHODS:
+            return controller.gates.get("read")
+        if self.email_routes:
+            try:
+                if resolve(request.path_info).url_name in self.email_routes:
+                    return controller.gates.get("email")
+            except Resolver404:
+                pass
+        return controller.gates.get("write")
+
+    def _service_unavailable(self, request):
+        if "application/json" in request.headers.get("Accept", "") or request.headers.get("X-Requested-With"):
+            response = JsonResponse({"error": "overloaded"}, status=503)
+        else:
+            response = HttpResponse(
+                "ただいま混み合っています。しばらくしてから、もう一度お試しください。",
+                status=503,
+                content_type="text/plain; charset=utf-8",
+            )
+        response["Retry-After"] = str(RETRY_AFTER)
+        return response
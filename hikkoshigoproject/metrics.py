@@ -0,0 +1,266 @@
+"""
+リクエストの計測（view ごとの件数・処理時間・SQL・テンプレート描画・レスポンスサイズ）
+
+- RequestMetricsMiddleware を MIDDLEWARE の先頭に入れて計測する
+- 集計値は metrics_view（スタッフのみ）で Prometheus のテキスト形式で返す
+- 集計はワーカープロセスごと（スクレイプしたプロセスの値が返る）
+- SQLite の SQLITE_BUSY のやり直し回数（hikkoshigoproject/sqlite_backend）と
+  レート制限・アドミッション制御の件数（hikkoshigoproject/ratelimit.py・admission.py）も一緒に返す
+- health_view はロードバランサーのヘルスチェック用（アドミッション制御の対象外）
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils.crypto import constant_time_compare
+
+from .admission import controller
+from .ratelimit import limiter
+from .sqlite_backend.base import busy_stats
+
+# 処理時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 実行中のリクエストの計測値（SQL・テンプレートの集計先）
+_current = ContextVar("request_metrics", default=None)
+
+
+class _RequestStats:
+    __slots__ = ("sql_count", "sql_time", "template_time")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+
+class _ViewMetrics:
+    __slots__ = ("count", "buckets", "latency_sum", "sql_count", "sql_time",
+                 "template_time", "response_bytes", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.response_bytes = 0
+        self.errors = 0
+
+
+class MetricsRegistry:
+    """view 名ごとの集計（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._views = {}
+
+    def record(self, view, latency, stats, response_bytes, is_error):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = _ViewMetrics()
+            metrics.count += 1
+            metrics.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            metrics.latency_sum += latency
+            metrics.sql_count += stats.sql_count
+            metrics.sql_time += stats.sql_time
+            metrics.template_time += stats.template_time
+            metrics.response_bytes += response_bytes
+            metrics.errors += is_error
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: _copy(metrics) for view, metrics in sorted(self._views.items())
+            }
+
+    def render_prometheus(self, extra=()):
+        """Prometheus のテキスト形式にする（extra は (名前, 説明, 種類, [(ラベル, 値)]) のリスト）"""
+        views = self.snapshot()
+        lines = []
+
+        def metric(name, help_text, kind, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric("hikkoshigo_requests_total", "Requests handled, by view.", "counter",
+               [((("view", v),), m.count) for v, m in views.items()])
+        metric("hikkoshigo_request_errors_total", "Responses with status >= 500, by view.", "counter",
+               [((("view", v),), m.errors) for v, m in views.items()])
+
+        histogram = []
+        for v, m in views.items():
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, m.buckets):
+                cumulative += n
+                histogram.append(((("view", v), ("le", repr(bound))), cumulative))
+            histogram.append(((("view", v), ("le", "+Inf")), m.count))
+        lines.append("# HELP hikkoshigo_request_duration_seconds Request latency, by view.")
+        lines.append("# TYPE hikkoshigo_request_duration_seconds histogram")
+        for labels, value in histogram:
+            label_text = ",".join(f'{k}="{_escape(val)}"' for k, val in labels)
+            lines.append(f"hikkoshigo_request_duration_seconds_bucket{{{label_text}}} {value}")
+        for v, m in views.items():
+            lines.append(f'hikkoshigo_request_duration_seconds_sum{{view="{_escape(v)}"}} {m.latency_sum}')
+            lines.append(f'hikkoshigo_request_duration_seconds_count{{view="{_escape(v)}"}} {m.count}')
+
+        metric("hikkoshigo_sql_queries_total", "SQL queries executed, by view.", "counter",
+               [((("view", v),), m.sql_count) for v, m in views.items()])
+        metric("hikkoshigo_sql_duration_seconds_total", "Time spent in SQL, by view.", "counter",
+               [((("view", v),), m.sql_time) for v, m in views.items()])
+        metric("hikkoshigo_template_render_seconds_total", "Time spent rendering templates, by view.", "counter",
+               [((("view", v),), m.template_time) for v, m in views.items()])
+        metric("hikkoshigo_response_bytes_total", "Response body bytes, by view.", "counter",
+               [((("view", v),), m.response_bytes) for v, m in views.items()])
+
+        for name, help_text, kind, samples in extra:
+            metric(name, help_text, kind, samples)
+
+        return "\n".join(lines) + "\n"
+
+
+def _copy(metrics):
+    copied = _ViewMetrics()
+    for name in _ViewMetrics.__slots__:
+        value = getattr(metrics, name)
+        setattr(copied, name, list(value) if isinstance(value, list) else value)
+    return copied
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrappers 用: リクエスト中の SQL の件数と時間を数える"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - start
+        stats.sql_count += 1
+
+
+_original_template_render = DjangoTemplate.render
+
+
+def _timed_template_render(self, context=None, request=None):
+    """テンプレート描画の時間を数える（render() / TemplateResponse はここを通る）"""
+    stats = _current.get()
+    if stats is None:
+        return _original_template_render(self, context, request)
+    start = time.perf_counter()
+    try:
+        return _original_template_render(self, context, request)
+    finally:
+        stats.template_time += time.perf_counter() - start
+
+
+def _install_sql_wrapper(sender=None, connection=None, **kwargs):
+    """DB 接続に SQL の計測を仕込む（connection_created で接続ごとに1回）
+    リクエスト中かどうかは ContextVar で判定するので、async の view から
+    sync_to_async で使われる別スレッドの接続でも数えられる
+    """
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+class RequestMetricsMiddleware:
+    """
+    リクエストごとに view 名・処理時間・SQL の件数と時間・テンプレート描画時間・
+    レスポンスサイズを記録する（MIDDLEWARE の先頭に置く）
+    sync / async どちらでも動く（ASGI で async の view をスレッドに回さないため）
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # テンプレート描画の計測（一度だけ差し替える）
+        DjangoTemplate.render = _timed_template_render
+        # SQL の計測（これから張る接続と、このスレッドで張り済みの接続）
+        connection_created.connect(_install_sql_wrapper, dispatch_uid="request_metrics_sql")
+        for connection in connections.all(initialized_only=True):
+            _install_sql_wrapper(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self._record(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self._record(request, response, stats, start)
+        return response
+
+    def _record(self, request, response, stats, start):
+        latency = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        size = 0 if response.streaming else len(response.content)
+        registry.record(view, latency, stats, size, response.status_code >= 500)
+
+
+def metrics_view(request):
+    """計測値を Prometheus のテキスト形式で返す（スタッフ、または METRICS_TOKEN を持つスクレイパーのみ）"""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized:
+        return HttpResponseForbidden("forbidden")
+
+    return HttpResponse(
+        registry.render_prometheus(
+            extra=busy_stats.prometheus() + limiter.prometheus() + controller.prometheus()
+        ),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def health_view(request):
+    """ヘルスチェック（DB につながるかだけ確認する。混み合っていても 503 にしない）"""
+    try:
+        with connections["default"].cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception:
+        return HttpResponse("db unavailable", status=503, content_type="text/plain")
+    return HttpResponse("ok", content_type="text/plain")
@@ -0,0 +1,199 @@
+"""
+重い処理をするルートのレート制限（トークンバケット）
+
+- settings.RATE_LIMITS に URL 名ごとの制限を書く（ユーザーごと・IP ごと・ルート全体）
+    RATE_LIMITS = {
+        "login": {"ip": "10/m", "route": "300/m"},
+        "save_message": {"user": "30/m"},
+    }
+  "N/期間"（s / m / h）は、N 回まで続けて受け付け、期間あたり N 回のペースで回復する
+- 制限を超えたら、パスワードのハッシュや DB の処理の前に 429 と Retry-After を返す
+  （セッション・ユーザーを読むのは "user" の制限があるルートだけ）
+- 対象は POST などの書き込みのリクエストだけ（GET は URL の解決もしない）
+- バケットはワーカープロセスごと（ワーカーが N 個なら最大で N 倍まで通る）
+- 拒否した件数は metrics_view で返す
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+
+# 制限する HTTP メソッド
+LIMITED_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# ワーカーごとに覚えておくバケットの上限（古いものから捨てる。捨てたバケットは満タンに戻る）
+MAX_BUCKETS = 10000
+
+# 制限のかけ方（ユーザーごと・IP ごと・ルート全体）
+SCOPES = ("user", "ip", "route")
+
+_RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smh])\s*$")
+_PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_rate(rate):
+    """"10/m" → (容量, 1秒あたりの回復量)。"10/5m" のように期間に数も付けられる"""
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"レート制限の書き方が正しくありません: {rate!r}（例: '10/m'）")
+    count, multiplier, unit = match.groups()
+    count = int(count)
+    return count, count / (int(multiplier or 1) * _PERIODS[unit])
+
+
+class TokenBucketLimiter:
+    """キーごとのトークンバケット（スレッドセーフ）"""
+
+    def __init__(self, max_buckets=MAX_BUCKETS, clock=time.monotonic):
+        self._lock = Lock()
+        self._buckets = OrderedDict()
+        self._max_buckets = max_buckets
+        self._clock = clock
+        self.rejected = {}
+
+    def take(self, requests):
+        """requests = [(キー, 容量, 回復量), ...] から1つずつ取る
+        バケットごとの待つべき秒数のリストを返す（全部 0 なら取れた。1つでも足りなければ何も取らない）
+        """
+        now = self._clock()
+        with self._lock:
+            levels, waits = [], []
+            for key, capacity, refill in requests:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * refill)
+                levels.append((key, tokens))
+                waits.append((1 - tokens) / refill if tokens < 1 else 0.0)
+
+            consumed = 0 if any(waits) else 1
+            for key, tokens in levels:
+                self._store(key, tokens - consumed, now)
+            return waits
+
+    def _store(self, key, tokens, now):
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self._max_buckets:
+            self._buckets.popitem(last=False)
+
+    def record_rejection(self, route, scope):
+        with self._lock:
+            self.rejected[(route, scope)] = self.rejected.get((route, scope), 0) + 1
+
+    def prometheus(self):
+        """metrics.registry.render_prometheus(extra=...) に渡す形"""
+        with self._lock:
+            rejected = dict(self.rejected)
+        return [
+            ("hikkoshigo_rate_limited_total", "Requests rejected with 429, by route and limit scope.", "counter",
+             [((("route", r), ("scope", s)), n) for (r, s), n in sorted(rejected.items())]),
+        ]
+
+
+limiter = TokenBucketLimiter()
+
+
+def client_ip(request):
+    """クライアントの IP（RATE_LIMIT_IP_HEADER があれば、その最後の値＝手前のプロキシが付けた値）"""
+    header = getattr(settings, "RATE_LIMIT_IP_HEADER", None)
+    if header:
+        forwarded = request.headers.get(header, "")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+class RateLimitMiddleware:
+    """settings.RATE_LIMITS の制限をかける（AuthenticationMiddleware の後、AdmissionControlMiddleware の前に置く）"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        rules = getattr(settings, "RATE_LIMITS", None)
+        if not rules:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # URL 名 → [(制限のかけ方, 容量, 回復量)]
+        self.rules = {}
+        for route, limits in rules.items():
+            unknown = set(limits) - set(SCOPES)
+            if unknown:
+                raise ValueError(f"RATE_LIMITS[{route!r}] に不明な制限があります: {', '.join(sorted(unknown))}")
+            self.rules[route] = [(scope, *parse_rate(rate)) for scope, rate in limits.items() if rate]
+        # ユーザーごとの制限があるルート（ここだけセッションとユーザーを読む）
+        self.user_routes = {route for route, rules in self.rules.items() if any(r[0] == "user" for r in rules)}
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route = self._route(request)
+        if route is not None:
+            user = request.user if route in self.user_routes else None
+            response = self._check(request, route, user)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        route = self._route(request)
+        if route is not None:
+            # request.user に触ると同期の DB アクセスになるので auser() で取る
+            user = await request.auser() if route in self.user_routes else None
+            response = self._check(request, route, user)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def _route(self, request):
+        """制限のあるルートなら URL 名（それ以外は None）"""
+        if request.method not in LIMITED_METHODS:
+            return None
+        try:
+            route = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        return route if route in self.rules else None
+
+    def _key(self, request, scope, user):
+        if scope == "route":
+            return "*"
+        if scope == "user" and user.is_authenticated:
+            return f"user:{user.pk}"
+        # 未ログインのときは IP ごとに数える
+        return f"ip:{client_ip(request)}"
+
+    def _check(self, request, route, user):
+        """user は "user" の制限があるルートのときだけ渡される（それ以外は None）"""
+        requests = [
+            (f"{route}:{scope}:{self._key(request, scope, user)}", capacity, refill)
+            for scope, capacity, refill in self.rules[route]
+        ]
+        waits = limiter.take(requests)
+        if not any(waits):
+            return None
+
+        for (scope, _, _), wait in zip(self.rules[route], waits):
+            if wait:
+                limiter.record_rejection(route, scope)
+        return self._too_many_requests(request, math.ceil(max(waits)))
+
+    def _too_many_requests(self, request, retry_after):
+        if "application/json" in request.headers.get("Accept", "") or request.headers.get("X-Requested-With"):
+            response = JsonResponse({"error": "rate_limited", "retry_after": retry_after}, status=429)
+        else:
+            response = HttpResponse(
+                "リクエストが多すぎます。しばらくしてから、もう一度お試しください。",
+                status=429,
+                content_type="text/plain; charset=utf-8",
+            )
+        response["Retry-After"] = str(retry_after)
+        return response
@@ -50,11 +50,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hikkoshigoproject.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # STATIC_ROOT の配信（DEBUG 中は使わない。hikkoshigoproject/staticfiles.py）
+    'hikkoshigoproject.staticfiles.StaticFilesMiddleware',
+    # セッションとユーザーは触るまで読まない（レート制限で "user" の制限があるルートだけ読む）
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # 重い処理をするルートのレート制限（hikkoshigoproject/ratelimit.py）。制限を超えたものは枠を使わせない
+    'hikkoshigoproject.ratelimit.RateLimitMiddleware',
+    # 同時処理数の上限と 503 による負荷制限（hikkoshigoproject/admission.py）
+    'hikkoshigoproject.admission.AdmissionControlMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,10 +95,46 @@ WSGI_APPLICATION = 'hikkoshigoproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite（WAL・pragma・SQLITE_BUSY のやり直し。hikkoshigoproject/sqlite_backend/base.py）
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'hikkoshigoproject.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # 接続をリクエストをまたいで使い回す時間（秒）
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # トランザクションの最初に書き込みロックを取る（途中でロックを取りに行って SQLITE_BUSY にならない）
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# 世帯ごとのデータ（Task / Message / Invite / MessageReadState）を分ける SQLite の数（0 なら分けない。app/shards.py）
+# 数を変えたら rebalance_shards で移す（減らすときは DATABASE_SHARDS_PREVIOUS に元の数を入れておく）
+DATABASE_SHARDS = int(os.getenv('DATABASE_SHARDS', '0'))
+DATABASE_SHARDS_PREVIOUS = int(os.getenv('DATABASE_SHARDS_PREVIOUS', '0'))
+DATABASE_SHARD_DIR = Path(os.getenv('DATABASE_SHARD_DIR', BASE_DIR / 'shards'))
+for _index in range(max(DATABASE_SHARDS, DATABASE_SHARDS_PREVIOUS)):
+    DATABASES[f'shard_{_index}'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_SHARD_DIR / f'shard_{_index}.sqlite3',
+        # カタログ（default）を読み取り専用でつなぐ（メッセージと送信者の名前の JOIN などに使う）
+        'OPTIONS': {**DATABASES['default']['OPTIONS'], 'attach': {'catalog': DATABASES['default']['NAME']}},
+    }
+
+DATABASE_ROUTERS = ['app.shards.HouseholdShardRouter']
+
+
+# キャッシュ（同じマシンのワーカー間で共有する SQLite ファイル。hikkoshigoproject/sqlite_cache.py）
+CACHES = {
+    'default': {
+        'BACKEND': 'hikkoshigoproject.sqlite_cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
     }
 }
 
@@ -121,7 +165,21 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'app', 'static')]
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# build_css / optimize_images の出力先（bundles/・optimized/。テンプレートタグ css_bundle / responsive_img が読み込む）
+ASSET_BUILD_DIR = os.path.join(BASE_DIR, 'build', 'static')
+if os.path.isdir(ASSET_BUILD_DIR):
+    STATICFILES_DIRS.append(ASSET_BUILD_DIR)
+
+# ハッシュ付きのファイル名 ＋ 圧縮済みファイル（.gz / .br）を collectstatic で書き出す
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'hikkoshigoproject.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -142,6 +200,48 @@ LOGOUT_REDIRECT_URL = '/login/'      # ログアウト後に戻る先
 
 AUTH_USER_MODEL = 'app.CustomUser'
 
+# ログインユーザーを MoveInfo・オーナーごとキャッシュから読み込む（app/auth_backends.py）
+AUTHENTICATION_BACKENDS = ['app.auth_backends.CachedModelBackend']
+
+# セッションはキャッシュから読む（DB にも書くのでキャッシュが消えてもログインは切れない）
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# レート制限（URL 名 → ユーザーごと・IP ごと・ルート全体の "回数/期間"。hikkoshigoproject/ratelimit.py）
+# POST などの書き込みだけが対象。バケットはワーカーごと
+RATE_LIMITS = {
+    # パスワードのハッシュ（PBKDF2）
+    'login': {'ip': '10/m', 'route': '300/m'},
+    'signup': {'ip': '5/m'},
+    'password_change': {'user': '5/m'},
+    'password_reset_confirm': {'ip': '10/m'},
+    # 行の追加・メール送信
+    'generate_invite_url': {'user': '10/m', 'ip': '30/m'},
+    'calendar_feed_token': {'user': '5/m'},
+    'save_message': {'user': '30/m', 'ip': '60/m'},
+    'message_register': {'user': '30/m', 'ip': '60/m'},
+    'change_email': {'user': '3/m', 'ip': '10/m'},
+    'password_reset': {'ip': '5/m', 'route': '60/m'},
+}
+# リバースプロキシの後ろで動かすときは、クライアントの IP が入るヘッダー（例: X-Forwarded-For）
+RATE_LIMIT_IP_HEADER = os.getenv('RATE_LIMIT_IP_HEADER')
+
+# アドミッション制御（ワーカーごと・リクエストの種類ごとの上限。hikkoshigoproject/admission.py）
+# concurrency: 同時に処理する数 / queue: 待てる数 / timeout: 待てる秒数（超えたら 503）
+# 再起動せずに変えるときは manage.py admission_control --set write.concurrency=2
+ADMISSION_CONTROL = {
+    'read': {'concurrency': 16, 'queue': 64, 'timeout': 2.0},
+    # SQLite の書き込みは1つずつなので、多く通してもロック待ちが増えるだけ
+    'write': {'concurrency': 4, 'queue': 32, 'timeout': 3.0},
+    'email': {'concurrency': 2, 'queue': 8, 'timeout': 5.0},
+}
+# メールを送るルート（URL 名）
+ADMISSION_EMAIL_ROUTES = ['change_email', 'password_reset']
+# 制限しないパス（STATIC_URL は常に対象外。SSE は接続している間ずっと枠を使ってしまう）
+ADMISSION_EXEMPT_PATHS = ['/healthz/', '/metrics/', '/message/events/']
+
+# 掲示板のリアルタイム更新（app/events.py）。ワーカーが複数あるときは共有する SQLite ファイルを指定する
+EVENTS_FANOUT_PATH = os.getenv("EVENTS_FANOUT_PATH")
+
 #  SendGrid API 用メール設定
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 
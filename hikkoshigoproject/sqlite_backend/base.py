@@ -0,0 +1,211 @@
+"""
+本番用の SQLite バックエンド（django.db.backends.sqlite3 の拡張）
+
+- 接続時に WAL と pragma（synchronous / cache_size / mmap_size / busy_timeout / temp_store）を設定する
+- ロック待ちでも SQLITE_BUSY になったら、少しずつ間隔を空けて（ジッター付き）やり直す
+  - やり直すのは、トランザクションの外の文・BEGIN・COMMIT だけ（途中の文をやり直すと結果が変わるため）
+  - やり直した回数は busy_stats に数え、/metrics/ に出す
+- 接続の使い回しは settings の CONN_MAX_AGE、書き込みロックの取り方は OPTIONS の transaction_mode で指定する
+- OPTIONS の "attach"（{スキーマ名: パス}）の DB を読み取り専用で ATTACH する
+  （シャードからカタログのテーブルを JOIN するため。app/shards.py）
+- time_budget(秒) の中では、文の実行とロック待ちに時間の上限をかける（やり直しはしない）
+  （ロック中は前回の表示を返すページ。app/page_cache.py）
+
+設定例:
+    DATABASES = {
+        "default": {
+            "ENGINE": "hikkoshigoproject.sqlite_backend",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": 600,
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "pragmas": {"cache_size": -64000}},
+        }
+    }
+"""
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.utils import debug_transaction
+
+# 接続時に設定する pragma（OPTIONS の "pragmas" で上書きできる）
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # 負の値は KiB 単位（約 20MB）
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    # SQLite 自身がロックを待つ時間（ミリ秒）。これで足りなければ下のやり直しに入る
+    "busy_timeout": 2000,
+    "temp_store": "MEMORY",
+}
+
+# SQLITE_BUSY のときのやり直し回数と、待ち時間（秒。0〜min(上限, 基準 × 2^回数) のランダム）
+BUSY_RETRIES = 4
+BUSY_BACKOFF_BASE = 0.05
+BUSY_BACKOFF_MAX = 1.0
+
+_BUSY_CODES = {sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED}
+
+# time_budget の中で、実行中の文を打ち切るか確かめる間隔（SQLite の VM 命令数）
+PROGRESS_STEPS = 10000
+
+
+class BusyStats:
+    """SQLITE_BUSY のやり直し回数（文の種類ごと・プロセスごと。スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.retries = {}
+        self.failures = {}
+        self.wait_seconds = 0.0
+
+    def record_retry(self, statement, wait):
+        with self._lock:
+            self.retries[statement] = self.retries.get(statement, 0) + 1
+            self.wait_seconds += wait
+
+    def record_failure(self, statement):
+        with self._lock:
+            self.failures[statement] = self.failures.get(statement, 0) + 1
+
+    def prometheus(self):
+        """metrics.registry.render_prometheus(extra=...) に渡す形"""
+        with self._lock:
+            retries, failures, wait_seconds = dict(self.retries), dict(self.failures), self.wait_seconds
+        return [
+            ("hikkoshigo_sqlite_busy_retries_total", "SQLITE_BUSY retries, by statement.", "counter",
+             [((("statement", s),), n) for s, n in sorted(retries.items())]),
+            ("hikkoshigo_sqlite_busy_failures_total", "Statements that stayed SQLITE_BUSY after all retries.",
+             "counter", [((("statement", s),), n) for s, n in sorted(failures.items())]),
+            ("hikkoshigo_sqlite_busy_wait_seconds_total", "Time spent backing off after SQLITE_BUSY.", "counter",
+             [((), wait_seconds)]),
+        ]
+
+
+busy_stats = BusyStats()
+
+
+def _is_busy(exc):
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        # 拡張エラーコード（SQLITE_BUSY_SNAPSHOT など）は下位 8 ビットが基本のコード
+        return code & 0xFF in _BUSY_CODES
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+def _retry_busy(statement, func, *args):
+    """SQLITE_BUSY の間、ジッター付きの待ち時間を空けて func をやり直す"""
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as exc:
+            if not _is_busy(exc):
+                raise
+            if attempt == BUSY_RETRIES:
+                busy_stats.record_failure(statement)
+                raise
+            wait = random.uniform(0, min(BUSY_BACKOFF_MAX, BUSY_BACKOFF_BASE * 2 ** attempt))
+            busy_stats.record_retry(statement, wait)
+            time.sleep(wait)
+
+
+class _TimeBudget:
+    """time_budget の上限と、上限をかけた接続（→ 元の busy_timeout）"""
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+        self.timeout_ms = max(1, int(seconds * 1000))
+        self.connections = {}
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def apply(self, conn):
+        """接続の最初の文の前に、ロック待ちの上限と打ち切りの確認を入れる（以降の期限は progress_handler で見る）"""
+        if conn in self.connections:
+            return
+        self.connections[conn] = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout = {self.timeout_ms}")
+        conn.set_progress_handler(self.expired, PROGRESS_STEPS)
+
+    def restore(self):
+        for conn, busy_timeout in self.connections.items():
+            try:
+                conn.set_progress_handler(None, 0)
+                conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+            except sqlite3.ProgrammingError:
+                # 途中で閉じられた接続
+                pass
+
+
+# 今かかっている time_budget（スレッド・コルーチンごと）
+_budget = ContextVar("sqlite_time_budget", default=None)
+
+
+@contextmanager
+def time_budget(seconds):
+    """この中で実行する文に時間の上限をかける
+    超えたら OperationalError（実行中なら "interrupted"、ロック待ちなら "database is locked"）
+    """
+    budget = _TimeBudget(seconds)
+    token = _budget.set(budget)
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+        budget.restore()
+
+
+def _statement(query):
+    return query.lstrip().split(None, 1)[0].lower() if query.strip() else "empty"
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """トランザクションの外の文（BEGIN を含む）は SQLITE_BUSY ならやり直す（time_budget の中では上限をかけるだけ）"""
+
+    def execute(self, query, params=None):
+        budget = _budget.get()
+        if budget is not None:
+            budget.apply(self.connection)
+        if budget is not None or self.connection.in_transaction:
+            return super().execute(query, params)
+        return _retry_busy(_statement(query), super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        budget = _budget.get()
+        if budget is not None:
+            budget.apply(self.connection)
+        if budget is not None or self.connection.in_transaction:
+            return super().executemany(query, param_list)
+        # やり直すときにもう一度読めるようにリストにしておく
+        return _retry_busy(_statement(query), super().executemany, query, list(param_list))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop("pragmas", {})}
+        self.attach = kwargs.pop("attach", {})
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        for schema, path in self.attach.items():
+            # 読み取り専用なので、こちらのトランザクションが相手のファイルの書き込みロックを取ることはない
+            conn.execute(f'ATTACH DATABASE ? AS "{schema}"', (Path(path).resolve().as_uri() + "?mode=ro",))
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=SQLiteCursorWrapper)
+
+    def _commit(self):
+        if self.connection is not None:
+            with debug_transaction(self, "COMMIT"), self.wrap_database_errors:
+                return _retry_busy("commit", self.connection.commit)
@@ -0,0 +1,279 @@
+"""
+プロセス間で共有できるキャッシュバックエンド（SQLite の WAL ファイルに保存）
+
+- 同じマシンの複数の WSGI ワーカーが1つのファイルを共有する（Redis なしで使える）
+- 件数の上限（MAX_ENTRIES）を超えたら、最近使われていないものから消す（LRU）
+  最終アクセス時刻はメモリに溜めて ACCESS_FLUSH_INTERVAL 秒ごとにまとめて書く
+  （読み込みのたびに書き込みロックを取らない）
+- 有効期限（TTL）あり。incr / decr は UPDATE ... RETURNING で原子的に行う
+- 接続はスレッドごとに1本（fork 後は作り直す）
+
+設定例:
+    CACHES = {
+        "default": {
+            "BACKEND": "hikkoshigoproject.sqlite_cache.SQLiteCache",
+            "LOCATION": BASE_DIR / "cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 50000},
+        }
+    }
+"""
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# ロック待ちの上限（ミリ秒）
+BUSY_TIMEOUT_MS = 5000
+
+# 最終アクセス時刻を記録し直す間隔（秒、キーごと）。消す順番の目安なので粗くてよい
+DEFAULT_LRU_RESOLUTION = 60.0
+
+# 溜めた最終アクセス時刻をまとめて書き込む間隔（秒、プロセスごと）
+DEFAULT_ACCESS_FLUSH_INTERVAL = 10.0
+
+# これだけ溜まったら間隔を待たずに書き込む
+MAX_PENDING_ACCESS = 1000
+
+# 何回の書き込みごとに件数を確認して間引くか
+DEFAULT_CULL_EVERY = 100
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS cache_entry (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed)",
+)
+
+
+def _encode(value):
+    # 整数はそのまま保存する（incr / decr を SQL の足し算で行うため）
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """SQLite（WAL）ファイルを使う共有キャッシュ"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        options = params.get("OPTIONS", {})
+        self._lru_resolution = float(options.get("LRU_RESOLUTION", DEFAULT_LRU_RESOLUTION))
+        self._cull_every = int(options.get("CULL_EVERY", DEFAULT_CULL_EVERY))
+        self._access_flush_interval = float(options.get("ACCESS_FLUSH_INTERVAL", DEFAULT_ACCESS_FLUSH_INTERVAL))
+        self._local = threading.local()
+        # 書き込みの回数（スレッド間で共有するので itertools.count で数える）
+        self._writes = itertools.count(1)
+        # 書き込み待ちの最終アクセス時刻（キー → 時刻）
+        self._pending_access = {}
+        self._access_lock = threading.Lock()
+        self._access_flushed_at = time.time()
+
+    # ---------------------------
+    # 接続
+    # ---------------------------
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        # fork したワーカーでは親の接続を使わない
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------------------------
+    # 読み込み
+    # ---------------------------
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version)
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires, accessed FROM cache_entry WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            return default
+        if now - accessed >= self._lru_resolution:
+            self._record_access([key], now)
+        return _decode(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        conn = self._connection()
+        now = time.time()
+        placeholders = ",".join("?" * len(key_map))
+        rows = conn.execute(
+            f"SELECT key, value, accessed FROM cache_entry "
+            f"WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)",
+            [*key_map, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows if now - accessed >= self._lru_resolution]
+        if stale:
+            self._record_access(stale, now)
+        return {key_map[key]: _decode(value) for key, value, _ in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    # ---------------------------
+    # 最終アクセス時刻（LRU）
+    # ---------------------------
+    def _record_access(self, keys, now):
+        """最終アクセス時刻をメモリに溜め、間隔が空いたか溜まりすぎたらまとめて書き込む"""
+        with self._access_lock:
+            for key in keys:
+                self._pending_access[key] = now
+            if (
+                now - self._access_flushed_at < self._access_flush_interval
+                and len(self._pending_access) < MAX_PENDING_ACCESS
+            ):
+                return
+            pending, self._pending_access = self._pending_access, {}
+            self._access_flushed_at = now
+        self._write_access(pending)
+
+    def _flush_access(self):
+        with self._access_lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._access_flushed_at = time.time()
+        if pending:
+            self._write_access(pending)
+
+    def _write_access(self, pending):
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # set() などで新しい時刻が入っていたら戻さない
+            conn.executemany(
+                "UPDATE cache_entry SET accessed = ? WHERE key = ? AND accessed < ?",
+                [(accessed, key, accessed) for key, accessed in pending.items()],
+            )
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # 消す順番の目安なので、ロックが取れなければ捨てる
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    # ---------------------------
+    # 書き込み
+    # ---------------------------
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        self._connection().execute(
+            "INSERT INTO cache_entry (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = excluded.value, expires = excluded.expires, accessed = excluded.accessed",
+            (key, _encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        # 期限切れの行だけは上書きできる
+        cursor = self._connection().execute(
+            "INSERT INTO cache_entry (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = excluded.value, expires = excluded.expires, accessed = excluded.accessed "
+            "WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= excluded.accessed",
+            (key, _encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        added = cursor.rowcount > 0
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE cache_entry SET expires = ?, accessed = ? "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version)
+        now = time.time()
+        row = self._connection().execute(
+            "UPDATE cache_entry SET value = value + ?, accessed = ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, now, key, now),
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        cursor = self._connection().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version) for key in keys]
+        if keys:
+            self._connection().execute(
+                f"DELETE FROM cache_entry WHERE key IN ({','.join('?' * len(keys))})", keys
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entry")
+
+    # ---------------------------
+    # 間引き（期限切れ → 最近使われていないもの）
+    # ---------------------------
+    def _maybe_cull(self):
+        if next(self._writes) % self._cull_every:
+            return
+        self._cull()
+
+    def _cull(self):
+        # 溜めている最終アクセス時刻を先に書いてから、古い順に消す
+        self._flush_access()
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conn.execute("DELETE FROM cache_entry")
+            return
+        # 上限を超えた分 ＋ 上限の 1/CULL_FREQUENCY を古い順に消す
+        excess = count - self._max_entries + self._max_entries // self._cull_frequency
+        conn.execute(
+            "DELETE FROM cache_entry WHERE key IN "
+            "(SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)",
+            (excess,),
+        )
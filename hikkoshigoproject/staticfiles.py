@@ -0,0 +1,277 @@
+"""
+静的ファイルの保存（collectstatic）と配信
+
+- CompressedManifestStaticFilesStorage: ファイル名に内容のハッシュを付け、
+  圧縮が効くファイルは .gz（brotli があれば .br も）を一緒に書き出す
+- StaticFilesMiddleware: STATIC_ROOT のファイルを配信する
+  - ハッシュ付きのファイルは immutable で1年キャッシュさせる
+  - Accept-Encoding を見て圧縮済みのファイルを選ぶ（Vary: Accept-Encoding）
+  - ETag / Last-Modified による 304、Range による部分取得（206）
+  - DEBUG 中は使わない（runserver が STATICFILES_DIRS から配信する）
+"""
+import gzip
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # brotli が無ければ gzip だけ作る
+    brotli = None
+
+# 圧縮して効果があるファイル（画像・PDF などはすでに圧縮済み）
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".map", ".txt", ".html", ".xml", ".ico"}
+
+# これより小さいファイルは圧縮しない（バイト）
+COMPRESS_MIN_SIZE = 512
+
+# 圧縮後のサイズが元の何割以下なら残すか
+COMPRESS_MAX_RATIO = 0.95
+
+# 圧縮ファイルの拡張子（Accept-Encoding で優先する順）
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# ハッシュ付きファイルのキャッシュ期間（秒）と、それ以外のキャッシュ期間
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+DEFAULT_MAX_AGE = 60
+
+# 読み出しの単位（Range のとき）
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _compress(content):
+    """{拡張子: 圧縮後のバイト列}（効果が無いものは含めない）"""
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return {
+        suffix: data for suffix, data in variants.items()
+        if len(data) <= len(content) * COMPRESS_MAX_RATIO
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ハッシュ付きのファイル名 ＋ 圧縮済みファイル（.gz / .br）を書き出す"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name, hashed_name in self.hashed_files.items():
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with self.open(hashed_name) as f:
+                content = f.read()
+            if len(content) < COMPRESS_MIN_SIZE:
+                continue
+            for suffix, data in _compress(content).items():
+                compressed_name = hashed_name + suffix
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(data))
+                yield name, compressed_name, True
+
+
+class _StaticFile:
+    """配信する1ファイル（元のファイルと圧縮済みファイルの情報）"""
+
+    __slots__ = ("content_type", "immutable", "variants")
+
+    def __init__(self, path, immutable):
+        content_type, _ = guess_type(path)
+        self.content_type = content_type or "application/octet-stream"
+        self.immutable = immutable
+        # エンコーディング → (パス, サイズ, 更新時刻)。None は無圧縮
+        self.variants = {None: self._stat(path)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = self._stat(path + suffix)
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime
+
+    def choose(self, accept_encoding):
+        """Accept-Encoding に合う圧縮済みファイルを選ぶ"""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return None
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """STATIC_ROOT の静的ファイルを配信する（SecurityMiddleware の直後に置く）"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith("/") else "/" + settings.STATIC_URL
+        self.files = self._scan(settings.STATIC_ROOT)
+
+    def _scan(self, root):
+        """起動時に一度だけファイルを調べておく（リクエストごとに stat しない）"""
+        hashed_names = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        compressed_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith(compressed_suffixes) and os.path.exists(os.path.splitext(path)[0]):
+                    continue
+                files[self.prefix + name] = _StaticFile(path, immutable=name in hashed_names)
+        return files
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self._lookup(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    async def __acall__(self, request):
+        static_file = self._lookup(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return self.serve(request, static_file)
+
+    def _lookup(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        return self.files.get(request.path_info)
+
+    def serve(self, request, static_file):
+        range_header = request.headers.get("Range")
+        # Range のときは無圧縮のファイルから切り出す
+        encoding = None if range_header else static_file.choose(request.headers.get("Accept-Encoding", ""))
+        path, size, mtime = static_file.variants[encoding]
+        etag = f'"{int(mtime):x}-{size:x}{"-" + encoding if encoding else ""}"'
+        last_modified = formatdate(mtime, usegmt=True)
+
+        if self._not_modified(request, etag, mtime):
+            response = HttpResponseNotModified()
+            self._set_headers(response, static_file, etag, last_modified)
+            return response
+
+        if range_header and self._if_range_matches(request, etag, mtime):
+            response = self._range_response(request, range_header, path, size)
+            if response is not None:
+                response["Content-Type"] = static_file.content_type
+                self._set_headers(response, static_file, etag, last_modified)
+                return response
+
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=static_file.content_type)
+        else:
+            # Content-Disposition のファイル名は圧縮済みファイル（.gz / .br）ではなく元のファイルの名前にする
+            original = os.path.basename(static_file.variants[None][0])
+            response = FileResponse(open(path, "rb"), content_type=static_file.content_type, filename=original)
+        response["Content-Length"] = str(size)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        self._set_headers(response, static_file, etag, last_modified)
+        return response
+
+    def _set_headers(self, response, static_file, etag, last_modified):
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        response["Accept-Ranges"] = "bytes"
+        if len(static_file.variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        if static_file.immutable:
+            response["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response["Cache-Control"] = f"public, max-age={DEFAULT_MAX_AGE}"
+
+    def _not_modified(self, request, etag, mtime):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or etag in etags or f"W/{etag}" in etags
+        return self._unchanged_since(request.headers.get("If-Modified-Since"), mtime)
+
+    def _if_range_matches(self, request, etag, mtime):
+        """If-Range が無いか、今のファイルと一致するときだけ部分取得に応じる"""
+        if_range = request.headers.get("If-Range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        return self._unchanged_since(if_range, mtime)
+
+    @staticmethod
+    def _unchanged_since(header, mtime):
+        if not header:
+            return False
+        try:
+            return int(mtime) <= parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def _range_response(self, request, range_header, path, size):
+        """bytes=start-end（1区間のみ）に応える。解釈できない指定は None（全体を返す）"""
+        match = _RANGE_RE.match(range_header.strip())
+        if not match or match.groups() == ("", ""):
+            return None
+        start, end = match.groups()
+        if start:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        else:
+            # bytes=-N は末尾 N バイト
+            start, end = max(size - int(end), 0), size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        length = end - start + 1
+        if request.method == "HEAD":
+            response = HttpResponse(status=206)
+        else:
+            response = StreamingHttpResponse(_read_range(path, start, length), status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+        return response
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
@@ -21,6 +21,7 @@ from django.contrib.auth import views as auth_views
 from app.views import portfolio_top_view
 from app.views_custom_auth import CustomPasswordResetView
 from app.forms import CustomPasswordResetForm
+from hikkoshigoproject.metrics import health_view, metrics_view
      
 urlpatterns = [
     # パスワードリセット関連
@@ -40,6 +41,8 @@ urlpatterns = [
     path("", portfolio_top_view, name="portfolio_top"),
     path("portfolio/", portfolio_top_view, name="portfolio"),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
+    path('healthz/', health_view, name='health'),
     #path("accounts/", include("django.contrib.auth.urls")),
     
     path('', include('app.urls')),